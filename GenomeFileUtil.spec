@@ -37,6 +37,8 @@ module GenomeFileUtil {
     generate_missing_genes - If the file has CDS or mRNA with no corresponding
         gene, generate a spoofed gene.
     use_existing_assembly - Supply an existing assembly reference
+    parallel_workers - Number of worker processes used to parse the features
+        of the GenBank records (default 1, a serial parse)
 
     */
     typedef structure {
@@ -56,10 +58,47 @@ module GenomeFileUtil {
         usermeta metadata;
         boolean generate_missing_genes;
         string use_existing_assembly;
+        int    parallel_workers;
     } GenbankToGenomeParams;
 
+    /*
+    Resources used by one phase of an import or save.
+    phase - name of the phase, e.g. parse_records or save_objects. Phases
+        may nest, in which case the outer phase includes the inner one
+    wall_time - seconds spent in the phase
+    cpu_time - CPU seconds used by the thread that ran the phase, and for
+        phases in the main thread by the worker processes that finished
+        during the phase
+    peak_rss - highest resident memory of the process in bytes up to the
+        end of the phase. It is not reset between phases, so it is the
+        peak of the import so far rather than of the phase alone
+    bytes_read, bytes_written - bytes read and written by the thread that
+        ran the phase, where the platform reports them
+    features, features_per_second - number of features handled by the
+        phase and the rate they were handled at
+
+    @optional bytes_read bytes_written features features_per_second
+    */
+    typedef structure {
+        string phase;
+        float wall_time;
+        float cpu_time;
+        int peak_rss;
+        int bytes_read;
+        int bytes_written;
+        int features;
+        float features_per_second;
+    } PhaseTiming;
+
+    /*
+    timings - resources used by each phase of the import, which are also
+        written as JSON lines to <genome_name>_timings.jsonl on scratch
+
+    @optional timings
+    */
     typedef structure {
         string genome_ref;
+        list<PhaseTiming> timings;
     } GenomeSaveResult;
 
     funcdef genbank_to_genome(GenbankToGenomeParams params)
@@ -185,6 +224,8 @@ module GenomeFileUtil {
         and link to a taxon
     generate_missing_genes - If the file has CDS or mRNA with no corresponding
         gene, generate a spoofed gene. Off by default
+    parallel_workers - Number of worker processes used to transform the
+        features of the GFF file (default 1, a serial transformation)
     */
     typedef structure {
         File fasta_file;
@@ -201,6 +242,7 @@ module GenomeFileUtil {
         string scientific_name;
         usermeta metadata;
         boolean generate_missing_genes;
+        int    parallel_workers;
     } FastaGFFToGenomeParams;
 
     funcdef fasta_gff_to_genome(FastaGFFToGenomeParams params)
@@ -218,8 +260,14 @@ module GenomeFileUtil {
         boolean upgrade;
     } SaveOneGenomeParams;
 
+    /*
+    timings - resources used by each phase of the save
+
+    @optional timings
+    */
     typedef structure {
         Workspace.object_info info;
+        list<PhaseTiming> timings;
     } SaveGenomeResult;
 
     funcdef save_one_genome(SaveOneGenomeParams params)
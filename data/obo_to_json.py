@@ -1,14 +1,42 @@
+"""
+Converts an OBO file to a term to name mapping JSON and compiles it to the
+indexed form the importers look terms up in.
+
+    python obo_to_json.py <obo_file> <json_file>
+    python obo_to_json.py --compile <data_dir>
+
+The second form compiles every *_ontology_mapping.json in data_dir and is
+run when the image is built.
+"""
 import json
+import os
 import sys
 import re
 
-obo_file = sys.argv[1]
-json_file = sys.argv[2]
-txt = open(obo_file).read()
-out = {}
-for chunk in txt.split('[Term]'):
-    id = re.search('id: (\w*:\w*)', chunk)
-    name = re.search('name: (.*)', chunk)
-    if id and name:
-        out[id.group(1)] = name.group(1)
-json.dump(out, open(json_file, 'w'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+from GenomeFileUtil.core.OntologyIndex import write_ontology_index  # noqa: E402
+
+
+def compile_mapping(json_file):
+    index_file = re.sub(r'\.json$', '.idx', json_file)
+    write_ontology_index(json.load(open(json_file)), index_file)
+    print(f"Compiled {json_file} to {index_file}")
+
+
+if sys.argv[1] == '--compile':
+    data_dir = sys.argv[2]
+    for file in sorted(os.listdir(data_dir)):
+        if file.endswith('_ontology_mapping.json'):
+            compile_mapping(os.path.join(data_dir, file))
+else:
+    obo_file = sys.argv[1]
+    json_file = sys.argv[2]
+    txt = open(obo_file).read()
+    out = {}
+    for chunk in txt.split('[Term]'):
+        id = re.search('id: (\w*:\w*)', chunk)
+        name = re.search('name: (.*)', chunk)
+        if id and name:
+            out[id.group(1)] = name.group(1)
+    json.dump(out, open(json_file, 'w'))
+    compile_mapping(json_file)
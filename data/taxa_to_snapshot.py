@@ -0,0 +1,42 @@
+"""
+Compiles a dump of a taxon workspace into the taxonomy snapshot that
+GenomeInterface resolves taxa against before asking the search service.
+
+    python taxa_to_snapshot.py <taxa_dump> <snapshot_file> [workspace] [source]
+
+The dump has a taxon object per line as JSON, either as Workspace
+get_objects2 returns them ({"info": [...], "data": {...}}) or with the
+"object_name" and "data" the search service returns. The workspace
+defaults to ReferenceTaxons.
+
+The snapshot records source, by default the dump's file name, and the
+time the dump was last modified as the time it was built, so stale
+snapshots can be told apart. See "Taxonomy snapshot" in README.md.
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+from GenomeFileUtil.core.TaxonomySnapshot import write_taxonomy_snapshot  # noqa: E402
+
+
+def read_taxa(dump_file):
+    with open(dump_file) as dump:
+        for line in dump:
+            if not line.strip():
+                continue
+            taxon = json.loads(line)
+            object_name = taxon['info'][1] if 'info' in taxon else taxon['object_name']
+            yield object_name, taxon['data']
+
+
+dump_file = sys.argv[1]
+snapshot_file = sys.argv[2]
+workspace = sys.argv[3] if len(sys.argv) > 3 else 'ReferenceTaxons'
+source = sys.argv[4] if len(sys.argv) > 4 else os.path.basename(dump_file)
+built = os.path.getmtime(dump_file)
+write_taxonomy_snapshot(read_taxa(dump_file), workspace, snapshot_file, source, built)
+print(f"Compiled {dump_file} ({source}, dumped "
+      f"{time.strftime('%Y-%m-%d', time.gmtime(built))}) to {snapshot_file}")
@@ -84,7 +84,9 @@ class GenomeFileUtil:
            be used to set the scientific name of the genome and link to a
            taxon generate_missing_genes - If the file has CDS or mRNA with no
            corresponding gene, generate a spoofed gene. use_existing_assembly
-           - Supply an existing assembly reference) -> structure: parameter
+           - Supply an existing assembly reference parallel_workers - Number
+           of worker processes used to parse the features of the GenBank
+           records (default 1, a serial parse)) -> structure: parameter
            "file" of type "File" -> structure: parameter "path" of String,
            parameter "shock_id" of String, parameter "ftp_url" of String,
            parameter "genome_name" of String, parameter "workspace_name" of
@@ -95,9 +97,31 @@ class GenomeFileUtil:
            parameter "metadata" of type "usermeta" -> mapping from String to
            String, parameter "generate_missing_genes" of type "boolean" (A
            boolean - 0 for false, 1 for true. @range (0, 1)), parameter
-           "use_existing_assembly" of String
-        :returns: instance of type "GenomeSaveResult" -> structure: parameter
-           "genome_ref" of String
+           "use_existing_assembly" of String, parameter "parallel_workers" of
+           Long
+        :returns: instance of type "GenomeSaveResult" (timings - resources
+           used by each phase of the import, which are also written as JSON
+           lines to <genome_name>_timings.jsonl on scratch @optional timings)
+           -> structure: parameter "genome_ref" of String, parameter "timings"
+           of list of type "PhaseTiming" (Resources used by one phase of an
+           import or save. phase - name of the phase, e.g. parse_records or
+           save_objects. Phases may nest, in which case the outer phase
+           includes the inner one wall_time - seconds spent in the phase
+           cpu_time - CPU seconds used by the thread that ran the phase, and
+           for phases in the main thread by the worker processes that finished
+           during the phase peak_rss - highest resident memory of the process
+           in bytes up to the end of the phase. It is not reset between
+           phases, so it is the peak of the import so far rather than of the
+           phase alone bytes_read, bytes_written - bytes read and written by
+           the thread that ran the phase, where the platform reports them
+           features,
+           features_per_second - number of features handled by the phase and
+           the rate they were handled at @optional bytes_read bytes_written
+           features features_per_second) -> structure: parameter "phase" of
+           String, parameter "wall_time" of Double, parameter "cpu_time" of
+           Double, parameter "peak_rss" of Long, parameter "bytes_read" of
+           Long, parameter "bytes_written" of Long, parameter "features" of
+           Long, parameter "features_per_second" of Double
         """
         # ctx is the context object
         # return variables are: result
@@ -453,8 +477,10 @@ class GenomeFileUtil:
            scientific_name - will be used to set the scientific name of the
            genome and link to a taxon generate_missing_genes - If the file
            has CDS or mRNA with no corresponding gene, generate a spoofed
-           gene. Off by default) -> structure: parameter "fasta_file" of type
-           "File" -> structure: parameter "path" of String, parameter
+           gene. Off by default parallel_workers - Number of worker
+           processes used to transform the features of the GFF file
+           (default 1, a serial transformation)) -> structure: parameter
+           "fasta_file" of type "File" -> structure: parameter "path" of String, parameter
            "shock_id" of String, parameter "ftp_url" of String, parameter
            "gff_file" of type "File" -> structure: parameter "path" of
            String, parameter "shock_id" of String, parameter "ftp_url" of
@@ -465,9 +491,31 @@ class GenomeFileUtil:
            Long, parameter "scientific_name" of String, parameter "metadata"
            of type "usermeta" -> mapping from String to String, parameter
            "generate_missing_genes" of type "boolean" (A boolean - 0 for
-           false, 1 for true. @range (0, 1))
-        :returns: instance of type "GenomeSaveResult" -> structure: parameter
-           "genome_ref" of String
+           false, 1 for true. @range (0, 1)), parameter "parallel_workers" of
+           Long
+        :returns: instance of type "GenomeSaveResult" (timings - resources
+           used by each phase of the import, which are also written as JSON
+           lines to <genome_name>_timings.jsonl on scratch @optional timings)
+           -> structure: parameter "genome_ref" of String, parameter "timings"
+           of list of type "PhaseTiming" (Resources used by one phase of an
+           import or save. phase - name of the phase, e.g. parse_records or
+           save_objects. Phases may nest, in which case the outer phase
+           includes the inner one wall_time - seconds spent in the phase
+           cpu_time - CPU seconds used by the thread that ran the phase, and
+           for phases in the main thread by the worker processes that finished
+           during the phase peak_rss - highest resident memory of the process
+           in bytes up to the end of the phase. It is not reset between
+           phases, so it is the peak of the import so far rather than of the
+           phase alone bytes_read, bytes_written - bytes read and written by
+           the thread that ran the phase, where the platform reports them
+           features,
+           features_per_second - number of features handled by the phase and
+           the rate they were handled at @optional bytes_read bytes_written
+           features features_per_second) -> structure: parameter "phase" of
+           String, parameter "wall_time" of Double, parameter "cpu_time" of
+           Double, parameter "peak_rss" of Long, parameter "bytes_read" of
+           Long, parameter "bytes_written" of Long, parameter "features" of
+           Long, parameter "features_per_second" of Double
         """
         # ctx is the context object
         # return variables are: returnVal
@@ -510,8 +558,10 @@ class GenomeFileUtil:
            scientific_name - will be used to set the scientific name of the
            genome and link to a taxon generate_missing_genes - If the file
            has CDS or mRNA with no corresponding gene, generate a spoofed
-           gene. Off by default) -> structure: parameter "fasta_file" of type
-           "File" -> structure: parameter "path" of String, parameter
+           gene. Off by default parallel_workers - Number of worker
+           processes used to transform the features of the GFF file
+           (default 1, a serial transformation)) -> structure: parameter
+           "fasta_file" of type "File" -> structure: parameter "path" of String, parameter
            "shock_id" of String, parameter "ftp_url" of String, parameter
            "gff_file" of type "File" -> structure: parameter "path" of
            String, parameter "shock_id" of String, parameter "ftp_url" of
@@ -522,7 +572,8 @@ class GenomeFileUtil:
            Long, parameter "scientific_name" of String, parameter "metadata"
            of type "usermeta" -> mapping from String to String, parameter
            "generate_missing_genes" of type "boolean" (A boolean - 0 for
-           false, 1 for true. @range (0, 1))
+           false, 1 for true. @range (0, 1)), parameter "parallel_workers" of
+           Long
         :returns: instance of unspecified object
         """
         # ctx is the context object
@@ -746,7 +797,9 @@ class GenomeFileUtil:
            boolean - 0 for false, 1 for true. @range (0, 1)), parameter
            "upgrade" of type "boolean" (A boolean - 0 for false, 1 for true.
            @range (0, 1))
-        :returns: instance of type "SaveGenomeResult" -> structure: parameter
+        :returns: instance of type "SaveGenomeResult" (timings - resources
+           used by each phase of the save @optional timings) -> structure:
+           parameter
            "info" of type "object_info" (Information about an object,
            including user provided metadata. obj_id objid - the numerical id
            of the object. obj_name name - the name of the object. type_string
@@ -790,7 +843,26 @@ class GenomeFileUtil:
            kbasetest:my_workspace.), parameter "chsum" of String, parameter
            "size" of Long, parameter "meta" of type "usermeta" (User provided
            metadata about an object. Arbitrary key-value pairs provided by
-           the user.) -> mapping from String to String
+           the user.) -> mapping from String to String, parameter "timings" of
+           list of type "PhaseTiming" (Resources used by one phase of an
+           import or save. phase - name of the phase, e.g. parse_records or
+           save_objects. Phases may nest, in which case the outer phase
+           includes the inner one wall_time - seconds spent in the phase
+           cpu_time - CPU seconds used by the thread that ran the phase, and
+           for phases in the main thread by the worker processes that finished
+           during the phase peak_rss - highest resident memory of the process
+           in bytes up to the end of the phase. It is not reset between
+           phases, so it is the peak of the import so far rather than of the
+           phase alone bytes_read, bytes_written - bytes read and written by
+           the thread that ran the phase, where the platform reports them
+           features,
+           features_per_second - number of features handled by the phase and
+           the rate they were handled at @optional bytes_read bytes_written
+           features features_per_second) -> structure: parameter "phase" of
+           String, parameter "wall_time" of Double, parameter "cpu_time" of
+           Double, parameter "peak_rss" of Long, parameter "bytes_read" of
+           Long, parameter "bytes_written" of Long, parameter "features" of
+           Long, parameter "features_per_second" of Double
         """
         # ctx is the context object
         # return variables are: returnVal
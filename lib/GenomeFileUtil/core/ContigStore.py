@@ -0,0 +1,181 @@
+"""
+Scratch backed store of contig sequences for feature extraction.
+"""
+import hashlib
+import mmap
+import os
+import re
+import threading
+import uuid
+from bisect import bisect_right
+
+# A, C, G and T are packed four to a byte. Everything else (N, IUPAC codes,
+# gaps) is kept in a table of uniform runs which is applied on extraction
+BASES = b"ACGT"
+CHUNK_SIZE = 2 ** 22
+exception_re = re.compile(rb"([^ACGT])\1*")
+encode_table = bytes(BASES.find(bytes((i,)).upper()) if chr(i) in "ACGTacgt" else 0
+                     for i in range(256))
+shift_tables = [bytes(((i & 3) << shift) & 0xFF for i in range(256)) for shift in (6, 4, 2)]
+decode_tables = [bytes(BASES[(i >> shift) & 3] for i in range(256)) for shift in (6, 4, 2, 0)]
+complement_table = bytes.maketrans(b"ACGTRYKMBVDHSWN", b"TGCAYRMKVBHDSWN")
+# stores are read from worker threads when contigs are verified
+_map_lock = threading.Lock()
+
+
+def _pack(codes):
+    """Pack a bytes object of 2-bit codes into four codes per byte"""
+    width = (len(codes) + 3) // 4
+    packed = 0
+    for i, table in enumerate(shift_tables + [None]):
+        column = codes[i::4]
+        if table:
+            column = column.translate(table)
+        packed |= int.from_bytes(column.ljust(width, b"\x00"), 'big')
+    return packed.to_bytes(width, 'big')
+
+
+def _unpack(packed):
+    """Expand packed bytes into a bytearray of bases, four per byte"""
+    out = bytearray(len(packed) * 4)
+    for i, table in enumerate(decode_tables):
+        out[i::4] = packed.translate(table)
+    return out
+
+
+class ContigStore:
+    """Holds contig sequences in a 2-bit packed file on scratch which is
+    read through mmap, so only the requested slices are ever materialized.
+
+    Coordinates are 0-based and end exclusive, like python slices."""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, f"contig_store_{uuid.uuid4()}.2bit")
+        self._contigs = {}
+        self._exceptions = {}
+        self._out = None
+        self._size = 0
+        self._file = None
+        self._mmap = None
+        self._owner = True
+
+    def __getstate__(self):
+        # open handles can't cross process boundaries; they are reopened lazily
+        state = self.__dict__.copy()
+        state.update({'_out': None, '_file': None, '_mmap': None, '_owner': False})
+        return state
+
+    def __contains__(self, contig_id):
+        return contig_id in self._contigs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def keys(self):
+        return self._contigs.keys()
+
+    def length(self, contig_id):
+        return self._contigs[contig_id][1]
+
+    def subset(self, contig_ids):
+        """A read only view of some of the contigs that is cheap to send to a
+        worker process"""
+        view = ContigStore.__new__(ContigStore)
+        view.__dict__.update(self.__getstate__())
+        view._contigs = {c: self._contigs[c] for c in contig_ids}
+        view._exceptions = {c: self._exceptions[c] for c in contig_ids}
+        return view
+
+    def add(self, contig_id, sequence):
+        """Pack a contig sequence (str or Bio.Seq) into the store"""
+        if contig_id in self._contigs:
+            raise ValueError(f"Duplicate contig ID: {contig_id}")
+        if self._out is None:
+            self._out = open(self.path, 'ab')
+        sequence = str(sequence)
+        runs = []
+        for pos in range(0, len(sequence), CHUNK_SIZE):
+            chunk = sequence[pos:pos + CHUNK_SIZE].upper().encode('ascii')
+            for m in exception_re.finditer(chunk):
+                start, end = m.start() + pos, m.end() + pos
+                # merge runs split by a chunk boundary
+                if runs and runs[-1][1] == start and runs[-1][2] == chunk[m.start()]:
+                    runs[-1][1] = end
+                else:
+                    runs.append([start, end, chunk[m.start()]])
+            self._out.write(_pack(chunk.translate(encode_table)))
+        self._out.flush()
+        self._contigs[contig_id] = (self._size, len(sequence))
+        self._exceptions[contig_id] = ([r[0] for r in runs], runs)
+        self._size += (len(sequence) + 3) // 4
+        self._close_map()
+
+    def get(self, contig_id, start, end, strand='+'):
+        """Extract a sequence slice, reverse complemented for the - strand"""
+        seq = self._slice(contig_id, start, end)
+        if strand == '-':
+            return seq.translate(complement_table)[::-1].decode('ascii')
+        return seq.decode('ascii')
+
+    def _slice(self, contig_id, start, end):
+        offset, length = self._contigs[contig_id]
+        start, end = max(int(start), 0), min(int(end), length)
+        if start >= end:
+            return bytearray()
+        data = self._map()
+        first = start // 4
+        seq = _unpack(data[offset + first:offset + (end + 3) // 4])
+        shift = first * 4
+        starts, runs = self._exceptions[contig_id]
+        i = max(bisect_right(starts, start) - 1, 0)
+        while i < len(runs) and runs[i][0] < end:
+            run_start, run_end, base = runs[i]
+            if run_end > start:
+                lo, hi = max(run_start, start) - shift, min(run_end, end) - shift
+                seq[lo:hi] = bytes((base,)) * (hi - lo)
+            i += 1
+        if start > shift or len(seq) > end - shift:
+            del seq[end - shift:]
+            del seq[:start - shift]
+        return seq
+
+    def iter_chunks(self, contig_id, chunk_size=CHUNK_SIZE):
+        """Yield the full sequence of a contig as ascii bytearrays in chunks"""
+        length = self.length(contig_id)
+        for pos in range(0, length, chunk_size):
+            yield self._slice(contig_id, pos, pos + chunk_size)
+
+    def md5(self, contig_id):
+        """md5 of the uppercase contig sequence. hashlib releases the GIL, so
+        several contigs can be hashed at once from a thread pool"""
+        digest = hashlib.md5()
+        for chunk in self.iter_chunks(contig_id):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def _map(self):
+        if self._mmap is None:
+            with _map_lock:
+                if self._mmap is None:
+                    self._file = open(self.path, 'rb')
+                    self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def _close_map(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+    def close(self):
+        """Release the mapping and remove the backing file if this store
+        created it"""
+        self._close_map()
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+        if self._owner and os.path.exists(self.path):
+            os.remove(self.path)
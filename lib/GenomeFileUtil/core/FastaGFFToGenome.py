@@ -4,36 +4,181 @@ import datetime
 import hashlib
 import json
 import logging
+import multiprocessing
 import os
 import re
 import shutil
 import sys
 import time
-import urllib.parse as parse
 import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import Bio.SeqIO
-from Bio.Data import CodonTable
-from Bio.Data.CodonTable import TranslationError
-from Bio.Seq import Seq
 
 from GenomeFileUtil.core import GenomeUtils
+from GenomeFileUtil.core.ContigStore import ContigStore
+from GenomeFileUtil.core.FastaIndex import FastaIndex, UnindexableFasta
+from GenomeFileUtil.core.GFFParser import GFFRecord, gtf_identifiers, is_gtf_record, iter_gff
 from GenomeFileUtil.core.GenomeInterface import GenomeInterface
-from GenomeFileUtil.core.GenomeUtils import is_parent, warnings, \
-    check_full_contig_length_or_multi_strand_feature
+from GenomeFileUtil.core.GenomeJSON import write_genome_json
+from GenomeFileUtil.core.GenomeUtils import is_parent, warnings, ContigIndex, FragmentBuilder, \
+    LocationTable
 from GenomeFileUtil.core.GenomeUtils import propagate_cds_props_to_gene, load_ontology_mappings
+from GenomeFileUtil.core.OntologyClassifier import go_terms, split_db_xrefs
+from GenomeFileUtil.core.PhaseTimer import PhaseTimer
+from GenomeFileUtil.core.Translator import get_translator
 from installed_clients.AssemblyUtilClient import AssemblyUtil
 from installed_clients.DataFileUtilClient import DataFileUtil
 
-codon_table = CodonTable.ambiguous_generic_by_name["Standard"]
 strand_table = str.maketrans("1?.", "+++")
-snake_re = re.compile('((?<=[a-z0-9])[A-Z]|(?!^)[A-Z](?=[a-z]))')
 MAX_MISC_FEATURE_SIZE = 10000
-
-
-def make_snake_case(string):
-    """Simple function to convert CamelCase to snake_case"""
-    return snake_re.sub(r'_\1', string).lower()
+FEATURES_PER_BATCH = 5000
+MAX_PENDING_BATCHES_PER_WORKER = 4
+# the alphabet Bio.SeqIO gives sequences of an untyped FASTA file
+FASTA_MOLECULE_TYPE = 'SingleLetterAlphabet'
+# GTF lines that add nothing the exons and CDSs of a transcript don't
+GTF_DROPPED_TYPES = {'UTR', 'start_codon', 'stop_codon', 'Selenocysteine'}
+GTF_TYPES = {'five_prime_utr': 'five_prime_UTR', 'three_prime_utr': 'three_prime_UTR'}
+GTF_PART_TYPES = {'CDS', 'exon', 'five_prime_UTR', 'three_prime_UTR'}
+
+
+def _location(in_feature):
+    in_feature['strand'] = in_feature['strand'].replace(
+        "-1", "-").translate(strand_table)
+    if in_feature['strand'] == '+':
+        start = in_feature['start']
+    elif in_feature['strand'] == '-':
+        start = in_feature['end']
+    else:
+        raise ValueError('Invalid feature strand: {}'
+                         .format(in_feature['strand']))
+    return [
+        in_feature['contig'],
+        start,
+        in_feature['strand'],
+        in_feature['end'] - in_feature['start'] + 1
+    ]
+
+
+def _aliases(attributes):
+    keys = ('locus_tag', 'old_locus_tag', 'protein_id',
+            'transcript_id', 'gene', 'ec_number', 'gene_synonym')
+    alias_list = []
+    for key in keys:
+        if key in attributes:
+            alias_list.extend([(key, val) for val in attributes[key]])
+    return alias_list
+
+
+def _split_ontology_db_xrefs(attributes):
+    """Splits the ontology terms from the other db_xrefs of a feature.
+    Returns a list of (ontology, term) pairs and the db_xrefs"""
+    terms = []
+    # these are keys are formatted strangely and require special parsing
+    for key in ("go_process", "go_function", "go_component"):
+        terms += go_terms(attributes.get(key, []))
+
+    # CATH terms are not distinct from EC numbers so myst be found by key
+    for term in attributes.get('cath_funfam', []) + attributes.get('cath', []):
+        terms += [('CATH', ref) for ref in term.split(',')]
+
+    search_keys = ['ontology_term', 'db_xref', 'dbxref', 'product_source', 'tigrfam', 'pfam',
+                   'cog', 'go', 'po', 'ko']
+    ont_terms = []
+    # flatten out into list of values
+    for key in search_keys:
+        if key in attributes:
+            ont_terms += [x for y in attributes[key] for x in y.split(',')]
+
+    ref_terms, db_xrefs = split_db_xrefs(ont_terms)
+    return terms + ref_terms, db_xrefs
+
+
+def _extract_feature(contig_seq, in_feature):
+    """Does the work on a feature that doesn't depend on any other feature:
+    location, sequence, md5 and attribute parsing. Returns None if the
+    feature is not contained in its contig. ontology_terms holds the
+    (ontology, term) pairs until the feature is merged into the genome by
+    FastaGFFToGenome._merge_feature"""
+    contig_id = in_feature['contig']
+    if in_feature['start'] < 1 or in_feature['end'] > contig_seq.length(contig_id):
+        return None
+
+    feat_seq = contig_seq.get(contig_id, in_feature['start'] - 1, in_feature['end'],
+                              '-' if in_feature['strand'] in {'-', '-1'} else '+')
+    attributes = in_feature['attributes']
+
+    # The following is common to all the feature types
+    out_feat = {
+        "id": in_feature.get('ID'),
+        "type": in_feature['type'],
+        "location": [_location(in_feature)],
+        "dna_sequence": str(feat_seq),
+        "dna_sequence_length": len(feat_seq),
+        "md5": hashlib.md5(str(feat_seq).encode('utf8')).hexdigest(),
+        "warnings": [],
+        "flags": [],
+    }
+
+    # add optional fields
+    if 'note' in attributes:
+        out_feat['note'] = attributes["note"][0]
+    out_feat['ontology_terms'], db_xrefs = _split_ontology_db_xrefs(attributes)
+    aliases = _aliases(attributes)
+    if aliases:
+        out_feat['aliases'] = aliases
+    if db_xrefs:
+        out_feat['db_xrefs'] = db_xrefs
+    if 'product' in attributes:
+        out_feat['functions'] = attributes["product"]
+    if 'product_name' in attributes:
+        if "functions" in out_feat:
+            out_feat['functions'].extend(attributes["product_name"])
+        else:
+            out_feat['functions'] = attributes["product_name"]
+    if 'function' in attributes:
+        out_feat['functional_descriptions'] = attributes["function"]
+    if 'inference' in attributes:
+        GenomeUtils.parse_inferences(attributes['inference'])
+    if 'trans-splicing' in attributes.get('exception', []):
+        out_feat['flags'].append('trans_splicing')
+    if 'pseudo' in attributes.get('exception', []):
+        out_feat['flags'].append('pseudo')
+    if 'ribosomal-slippage' in attributes.get('exception', []):
+        out_feat['flags'].append('ribosomal_slippage')
+    return out_feat
+
+
+def _extract_features(contig_seq, features):
+    """_extract_feature for a batch of features in a worker process. Errors
+    are returned in place so they are raised in feature order on merging"""
+    extracted = []
+    for in_feature in features:
+        try:
+            extracted.append(_extract_feature(contig_seq, in_feature))
+        except ValueError as e:
+            extracted.append(e)
+    return extracted
+
+
+def _extend_span(spans, key, ftr):
+    """Grow the [contig, strand, start, end] of a GTF gene or transcript to
+    cover ftr. Lines on other contigs than the first are left out"""
+    span = spans.get(key)
+    if span is None:
+        spans[key] = [ftr.contig, ftr.strand, ftr.start, ftr.end]
+    elif span[0] == ftr.contig:
+        span[2] = min(span[2], ftr.start)
+        span[3] = max(span[3], ftr.end)
+
+
+def _gtf_parent(child, ftype, ident, parent, span, raw):
+    """A record for a gene or transcript that a GTF file only names"""
+    contig, strand, start, end = span
+    ftr = GFFRecord(contig, child.source, ftype, start, end, '.', strand, '.', raw)
+    ftr.ID, ftr.Parent = ident, parent
+    return ftr
 
 
 class FastaGFFToGenome:
@@ -53,13 +198,18 @@ class FastaGFFToGenome:
                            'start_codon', 'stop_codon', 'region', 'chromosome', 'scaffold')
         self.spoof_gene_count = 0
         self.is_phytozome = False
+        self.timer = PhaseTimer()
         self.strict = True
         self.generate_genes = False
+        self.parallel_workers = 1
         self.warnings = []
         self.feature_dict = collections.OrderedDict()
+        self.fragments = FragmentBuilder()
+        self.contig_seq = None
         self.cdss = set()
         self.ontologies_present = collections.defaultdict(dict)
         self.ontology_events = list()
+        self.ontology_event_index = {}
         self.skiped_features = collections.Counter()
         self.feature_counts = collections.Counter()
 
@@ -70,11 +220,14 @@ class FastaGFFToGenome:
         # 1) validate parameters
         self._validate_import_file_params(params)
         self.code_table = params.get('genetic_code', 11)
+        self.parallel_workers = params.get('parallel_workers') or 1
         # 2) construct the input directory staging area
+        self.timer.log_file = PhaseTimer.log_path(self.cfg.sharedFolder, params['genome_name'])
         input_directory = os.path.join(self.cfg.sharedFolder,
                                        'fast_gff_upload_' + str(uuid.uuid4()))
         os.makedirs(input_directory)
-        file_paths = self._stage_input(params, input_directory)
+        with self.timer.phase('stage_input'):
+            file_paths = self._stage_input(params, input_directory)
         # 3) extract out the parameters
         params = self._set_parsed_params(params)
         if params.get('generate_missing_genes'):
@@ -89,13 +242,14 @@ class FastaGFFToGenome:
 
         genome, input_directory = self.generate_genome_json(params)
 
-        json.dump(genome, open(f"{self.cfg.sharedFolder}/{genome['id']}.json", 'w'), indent=4)
+        if self.cfg.raw.get('dump-genome-json', '').lower() == 'true':
+            write_genome_json(genome, f"{self.cfg.sharedFolder}/{genome['id']}.json")
         result = self.gi.save_one_genome({
             'workspace': params['workspace_name'],
             'name': params['genome_name'],
             'data': genome,
             "meta": params.get('metadata', {}),
-        })
+        }, timer=self.timer)
         report_string = 'A genome with {} contigs and the following feature ' \
                         'types was imported: {}'.format(len(genome['contig_ids']), "\n".join(
                         [k + ": " + str(v) for k, v in genome['feature_counts'].items()]))
@@ -108,47 +262,58 @@ class FastaGFFToGenome:
         info = result['info']
         details = {
             'genome_ref': f'{info[6]}/{info[0]}/{info[4]}',
-            'genome_info': info
+            'genome_info': info,
+            'timings': self.timer.timings,
         }
 
         return details
 
     def _gen_genome_json(self, params, input_gff_file, input_fasta_file):
-
-        # reading in GFF file
-        features_by_contig = self._retrieve_gff_file(input_gff_file)
-        contig_ids = set()
-
-        # parse feature information
-        fasta_contigs = Bio.SeqIO.parse(input_fasta_file, "fasta")
-        for contig in fasta_contigs:
-            molecule_type = str(contig.seq.alphabet).replace(
-                'IUPACAmbiguous', '').strip('()')
-            contig_ids.add(contig.id)
-            for feature in features_by_contig.get(contig.id, []):
-                self._transform_feature(contig, feature)
-
-        for cid in set(features_by_contig.keys()) - contig_ids:
-            self.warn(f"Sequence name {cid} does not match a sequence id in the FASTA file."
-                      f"{len(features_by_contig[cid])} features will not be imported.")
-            if self.strict:
-                raise ValueError("Every feature sequence id must match a fasta sequence id")
-        self._process_cdss()
-
-        # save assembly file
-        assembly_ref = self.au.save_assembly_from_fasta(
-            {'file': {'path': input_fasta_file},
-             'workspace_name': params['workspace_name'],
-             'assembly_name': params['genome_name'] + ".assembly",
-             'type': params.get('genome_type', 'isolate'),
-             })
-        assembly_data = self.dfu.get_objects(
-            {'object_refs': [assembly_ref],
-             'ignore_errors': 0})['data'][0]['data']
+        # the uploads only wait on the callback service, so they run in
+        # threads while the features are processed
+        with ThreadPoolExecutor(max_workers=2) as io_executor:
+            assembly_future = io_executor.submit(self._save_assembly, params, input_fasta_file)
+
+            # reading in GFF file
+            with self.timer.phase('retrieve_gff_file') as phase:
+                features_by_contig = self._retrieve_gff_file(input_gff_file)
+                phase['features'] = sum(len(f) for f in features_by_contig.values())
+            contig_ids = set()
+
+            # Phytozome gff files are not compatible with the RNASeq Pipeline
+            # so it's better to build from the object than cache the file
+            gff_future = None
+            if self.is_phytozome:
+                gff_future = io_executor.submit(self._gff_to_shock, input_gff_file)
+
+            # parse feature information
+            with self.timer.phase('transform_features') as phase:
+                self.contig_seq = self._open_fasta(input_fasta_file)
+                with self.contig_seq:
+                    contig_ids.update(self.contig_seq.keys())
+                    features = [feature for contig_id in self.contig_seq.keys()
+                                for feature in features_by_contig.get(contig_id, [])]
+                    features = self._parents_first(features)
+                    for feature, out_feat in zip(features, self._extract_all(features)):
+                        self._merge_feature(feature, out_feat)
+                self.fragments.join(self.feature_dict)
+                phase['features'] = len(self.feature_dict)
+
+            for cid in set(features_by_contig.keys()) - contig_ids:
+                self.warn(f"Sequence name {cid} does not match a sequence id in the FASTA file."
+                          f"{len(features_by_contig[cid])} features will not be imported.")
+                if self.strict:
+                    raise ValueError("Every feature sequence id must match a fasta sequence id")
+            with self.timer.phase('process_cdss', len(self.cdss)):
+                self._process_cdss()
+
+            with self.timer.phase('wait_for_uploads'):
+                assembly_ref, assembly_data = assembly_future.result()
+                gff_handle_ref = gff_future.result() if gff_future else None
 
         # generate genome info
         genome = self._gen_genome_info(assembly_ref, assembly_data,
-                                       input_gff_file, molecule_type, params)
+                                       gff_handle_ref, FASTA_MOLECULE_TYPE, params)
 
         if self.spoof_gene_count > 0:
             self.warn(warnings['spoofed_genome'].format(self.spoof_gene_count))
@@ -159,23 +324,41 @@ class FastaGFFToGenome:
 
         return genome
 
-    @staticmethod
-    def _location(in_feature):
-        in_feature['strand'] = in_feature['strand'].replace(
-            "-1", "-").translate(strand_table)
-        if in_feature['strand'] == '+':
-            start = in_feature['start']
-        elif in_feature['strand'] == '-':
-            start = in_feature['end']
-        else:
-            raise ValueError('Invalid feature strand: {}'
-                             .format(in_feature['strand']))
-        return [
-            in_feature['contig'],
-            start,
-            in_feature['strand'],
-            in_feature['end'] - in_feature['start'] + 1
-        ]
+    def _save_assembly(self, params, input_fasta_file):
+        """Save the FASTA as an assembly and fetch it back for the genome"""
+        with self.timer.phase('save_assembly'):
+            assembly_ref = self.au.save_assembly_from_fasta(
+                {'file': {'path': input_fasta_file},
+                 'workspace_name': params['workspace_name'],
+                 'assembly_name': params['genome_name'] + ".assembly",
+                 'type': params.get('genome_type', 'isolate'),
+                 })
+            assembly_data = self.dfu.get_objects(
+                {'object_refs': [assembly_ref],
+                 'ignore_errors': 0})['data'][0]['data']
+        return assembly_ref, assembly_data
+
+    def _gff_to_shock(self, input_gff_file):
+        with self.timer.phase('file_to_shock'):
+            gff_file_to_shock = self.dfu.file_to_shock(
+                {'file_path': input_gff_file, 'make_handle': 1, 'pack': "gzip"})
+        return gff_file_to_shock['handle']['hid']
+
+    def _open_fasta(self, input_fasta_file):
+        """Sequence access for the FASTA file, through a .fai index unless the
+        file can't be indexed"""
+        try:
+            return FastaIndex(input_fasta_file)
+        except UnindexableFasta as e:
+            logging.info(f"{e}, packing the sequences to scratch instead")
+        contig_seq = ContigStore(self.cfg.sharedFolder)
+        try:
+            for contig in Bio.SeqIO.parse(input_fasta_file, "fasta"):
+                contig_seq.add(contig.id, contig.seq)
+        except Exception:
+            contig_seq.close()
+            raise
+        return contig_seq
 
     @staticmethod
     def _validate_import_file_params(params):
@@ -207,6 +390,9 @@ class FastaGFFToGenome:
         if params.get('genetic_code'):
             if not (isinstance(params['genetic_code'], int) and 0 < params['genetic_code'] < 32):
                 raise ValueError("Invalid genetic code specified: {}".format(params))
+        if params.get('parallel_workers'):
+            if not (isinstance(params['parallel_workers'], int) and params['parallel_workers'] > 0):
+                raise ValueError(f"Invalid parallel_workers specified: {params}")
 
     def _set_parsed_params(self, params):
         logging.info('Setting params')
@@ -238,6 +424,9 @@ class FastaGFFToGenome:
                 file_path = os.path.join(input_directory, os.path.basename(local_file_path))
                 logging.info(f'Moving file from {local_file_path} to {file_path}')
                 shutil.copy2(local_file_path, file_path)
+                # reuse an existing index of the FASTA rather than rebuilding it
+                if os.path.exists(local_file_path + '.fai'):
+                    shutil.copy2(local_file_path + '.fai', file_path + '.fai')
 
             elif file.get('shock_id') is not None:
                 # handle shock file
@@ -269,66 +458,31 @@ class FastaGFFToGenome:
     
         feature_list = collections.defaultdict(list)
         is_patric = 0
+        is_gtf = None
 
-        for current_line in open(input_gff_file):
-            if current_line.isspace() or current_line == "" or current_line.startswith("#"):
-                continue
-
-            #Split line
-            try:
-                (contig_id, source_id, feature_type, start, end,
-                 score, strand, phase, attributes) = current_line.split('\t')
-            except ValueError:
-                raise ValueError(f"unable to parse {current_line}")
+        for ftr in iter_gff(input_gff_file):
+            #GTF is told apart by the first attribute column of the file
+            if is_gtf is None:
+                is_gtf = is_gtf_record(ftr)
 
             #Checking to see if Phytozome
-            if "phytozome" in source_id.lower():
+            if "phytozome" in ftr.source.lower():
                 self.is_phytozome = True
 
             #Checking to see if Phytozome
-            if "PATRIC" in source_id:
+            if "PATRIC" in ftr.source:
                 is_patric = True
 
             #PATRIC prepends their contig ids with some gibberish
-            if is_patric and "|" in contig_id:
-                contig_id = contig_id.split("|", 1)[1]
-
-            #Populating basic feature object
-            ftr = {'contig': contig_id, 'source': source_id,
-                   'type': feature_type, 'start': int(start),
-                   'end': int(end), 'score': score, 'strand': strand,
-                   'phase': phase, 'attributes': collections.defaultdict(list)}
-
-            #Populating with attribute key-value pair
-            #This is where the feature id is from
-            for attribute in attributes.split(";"):
-                attribute = attribute.strip()
-
-                #Sometimes empty string
-                if not attribute:
-                    continue
+            if is_patric and "|" in ftr.contig:
+                ftr.contig = ftr.contig.split("|", 1)[1]
 
-                #Use of 1 to limit split as '=' character can also be made available later
-                #Sometimes lack of "=", assume spaces instead
-                if "=" in attribute:
-                    key, value = attribute.split("=", 1)
+            feature_list[ftr.contig].append(ftr)
 
-                elif " " in attribute:
-                    key, value = attribute.split(" ", 1)
-
-                else:
-                    logging.debug(f'Unable to parse {attribute}')
-                    continue
-
-                ftr['attributes'][make_snake_case(key)].append(parse.unquote(value.strip('"')))
-
-            ftr['attributes']['raw'] = attributes
-            if "id" in ftr['attributes']:
-                ftr['ID'] = ftr['attributes']['id'][0]
-            if "parent" in ftr['attributes']:
-                ftr['Parent'] = ftr['attributes']['parent'][0]
-
-            feature_list[contig_id].append(ftr)
+        #GTF identifies every line by its gene_id and transcript_id, which
+        #is all that is needed to build the gene structure
+        if is_gtf:
+            return self._assign_gtf_identifiers(feature_list)
 
         #Some GFF/GTF files don't use "ID" so we go through the possibilities        
         feature_list = self._add_missing_identifiers(feature_list)
@@ -395,40 +549,182 @@ class FastaGFFToGenome:
             feature_list[contig] = new_ftrs
         return feature_list
 
+    def _assign_gtf_identifiers(self, feature_list):
+        """Sets the ID and Parent of every GTF line from its gene_id and
+        transcript_id in place of the GFF3 identifier heuristics, adding the
+        gene and transcript lines a file leaves out"""
+        logging.info("Grouping GTF lines by gene_id and transcript_id")
+        #First pass hashes the lines by gene and transcript
+        lines = collections.defaultdict(list)
+        gene_lines = set()
+        transcript_lines = {}
+        exon_genes = {}
+        coding = set()
+        gene_spans = {}
+        transcript_spans = {}
+        for contig in feature_list:
+            for ftr in feature_list[contig]:
+                if ftr.type in GTF_DROPPED_TYPES:
+                    continue
+                ftr.type = GTF_TYPES.get(ftr.type, ftr.type)
+                gene_id, transcript_id = gtf_identifiers(ftr.raw)
+                lines[contig].append((ftr, gene_id, transcript_id))
+                if ftr.type == 'gene':
+                    gene_lines.add(gene_id)
+                    continue
+                if gene_id:
+                    _extend_span(gene_spans, gene_id, ftr)
+                if ftr.type not in GTF_PART_TYPES:
+                    if transcript_id or gene_id:
+                        transcript_lines.setdefault(transcript_id or gene_id,
+                                                    (ftr.type, gene_id))
+                elif transcript_id:
+                    _extend_span(transcript_spans, transcript_id, ftr)
+                    if ftr.type == 'CDS':
+                        coding.add(transcript_id)
+                    else:
+                        exon_genes.setdefault(transcript_id, gene_id)
+
+        #Transcripts only named by their exons get a line of their own. Their
+        #IDs follow the rules of _update_identifiers
+        listed = set(transcript_lines)
+        for transcript_id, gene_id in exon_genes.items():
+            transcript_lines.setdefault(transcript_id, ('transcript', gene_id))
+        transcripts = {}
+        for transcript_id, (ftype, gene_id) in transcript_lines.items():
+            if ftype == 'transcript' and transcript_id in coding:
+                ftype = 'mRNA'
+            #Coding transcripts need a gene, other lines that are their own
+            #gene are lone features
+            if transcript_id in coding or transcript_id in gene_lines:
+                gene_id = gene_id or transcript_id
+            elif gene_id == transcript_id:
+                gene_id = ''
+            ident = f"{transcript_id}.{ftype}" if gene_id == transcript_id else transcript_id
+            transcripts[transcript_id] = (ident, ftype, gene_id)
+
+        #Second pass sets the identifiers, putting each missing parent just
+        #before the first line that needs it
+        grouped = collections.defaultdict(list)
+        added_genes = set()
+        added_transcripts = set()
+
+        def add_gene(gene_id, ftr, ftrs):
+            if gene_id and gene_id not in gene_lines and gene_id not in added_genes:
+                added_genes.add(gene_id)
+                span = gene_spans.get(gene_id) or transcript_spans.get(gene_id)
+                ftrs.append(_gtf_parent(ftr, 'gene', gene_id, None, span,
+                                        f'gene_id "{gene_id}"'))
+
+        def add_transcript(transcript_id, ftr, ftrs):
+            ident, ftype, gene_id = transcripts[transcript_id]
+            add_gene(gene_id, ftr, ftrs)
+            if transcript_id not in listed and transcript_id not in added_transcripts:
+                added_transcripts.add(transcript_id)
+                ftrs.append(_gtf_parent(ftr, ftype, ident, gene_id or None,
+                                        transcript_spans[transcript_id],
+                                        f'gene_id "{gene_id}"; transcript_id "{transcript_id}"'))
+            return ident
+
+        for contig in lines:
+            ftrs = grouped[contig]
+            for ftr, gene_id, transcript_id in lines[contig]:
+                if not (gene_id or transcript_id):
+                    #Nothing to group by, as in GTF from genomes without parents
+                    if ftr.type not in self.skip_types:
+                        self.feature_counts[ftr.type] += 1
+                    ftr.ID = f"{ftr.type}_{self.feature_counts[ftr.type]}"
+                elif ftr.type == 'gene':
+                    ftr.ID = gene_id
+                elif ftr.type not in GTF_PART_TYPES:
+                    ftr.ID, ftr.type, gene_id = transcripts[transcript_id or gene_id]
+                    add_gene(gene_id, ftr, ftrs)
+                    ftr.Parent = gene_id or None
+                elif transcript_id in transcripts:
+                    ftr.Parent = add_transcript(transcript_id, ftr, ftrs)
+                    ftr.ID = f"{transcript_id}.{ftr.type}"
+                else:
+                    #A CDS directly under its gene
+                    ftr.Parent = gene_id or transcript_id
+                    add_gene(ftr.Parent, ftr, ftrs)
+                    if transcript_id and transcript_id != gene_id:
+                        ftr.ID = transcript_id
+                    else:
+                        ftr.ID = f"{ftr.Parent}.{ftr.type}"
+                ftrs.append(ftr)
+        return grouped
+
+    @staticmethod
+    def _parents_first(features):
+        """Order features so that each comes after its parent and after the
+        first part of a feature with the same ID, keeping the file order
+        otherwise. Files that are already sorted keep their order."""
+        first = {}
+        for feature in features:
+            first.setdefault(feature.get('ID'), feature)
+        placed = set()
+        visiting = set()
+        ordered = []
+        for feature in features:
+            stack = [feature]
+            while stack:
+                node = stack[-1]
+                if id(node) in placed:
+                    stack.pop()
+                    continue
+                visiting.add(id(node))
+                # a missing or cyclic parent is reported when it's transformed
+                pending = [p for p in (first.get(node.get('Parent')), first.get(node.get('ID')))
+                           if p is not None and p is not node and id(p) not in placed
+                           and id(p) not in visiting]
+                if pending:
+                    stack.append(pending[0])
+                    continue
+                stack.pop()
+                visiting.discard(id(node))
+                placed.add(id(node))
+                ordered.append(node)
+        return ordered
+
     @staticmethod
     def _update_phytozome_features(feature_list):
 
         #General rule is to use the "Name" field where possible
         #And update parent attribute correspondingly
         for contig in feature_list:
-            feature_position_dict = {}
-            for i in range(len(feature_list[contig])):
+            #Features by their old_id, found before any parent is updated so
+            #children may come before their parents
+            features_by_old_id = {}
+            renamed = []
+            for ftr in feature_list[contig]:
 
                 #Maintain old_id for reference
                 #Sometimes ID isn't available, so use PACid
                 old_id = None
                 for key in ("id", "pacid"):
-                    if key in feature_list[contig][i]['attributes']:
-                        old_id = feature_list[contig][i]['attributes'][key][0]
+                    if key in ftr['attributes']:
+                        old_id = ftr['attributes'][key][0]
                         break
                 if old_id is None:
                     continue
 
                 #Retain old_id
-                feature_position_dict[old_id]=i
+                features_by_old_id[old_id] = ftr
+                renamed.append(ftr)
 
                 # Clip off the increment on CDS IDs so fragments of the same
                 # CDS share the same ID
-                if "CDS" in feature_list[contig][i]["ID"]:
-                    feature_list[contig][i]["ID"] = feature_list[contig][i]["ID"].rsplit('.', 1)[0]
+                if "CDS" in ftr["ID"]:
+                    ftr["ID"] = ftr["ID"].rsplit('.', 1)[0]
 
                 #In Phytozome, gene and mRNA have "Name" field, CDS do not
-                if "name" in feature_list[contig][i]['attributes']:
-                    feature_list[contig][i]["ID"] = feature_list[contig][i]['attributes']['name'][0]
+                if "name" in ftr['attributes']:
+                    ftr["ID"] = ftr['attributes']['name'][0]
 
-                if "Parent" in feature_list[contig][i]:
-                    #Update Parent to match new ID of parent ftr
-                    feature_list[contig][i]["Parent"] = feature_list[contig][feature_position_dict[feature_list[contig][i]["Parent"]]]["ID"]
+            for ftr in renamed:
+                #Update Parent to match new ID of parent ftr
+                if "Parent" in ftr and ftr["Parent"] in features_by_old_id:
+                    ftr["Parent"] = features_by_old_id[ftr["Parent"]]["ID"]
 
         return feature_list
 
@@ -458,34 +754,14 @@ class FastaGFFToGenome:
 
         return feature_list
 
-    def _check_location_order(self,locations):
-        """If order looks good return None.  
-           If out of order return warning
-           If on multiple strands return warning"""
-        strand = None
-        last_start = 0
-        for location in locations:
-            if strand is None:
-                strand = location[2]
-            elif strand != location[2]:
-                return warnings["both_strand_coordinates"]
-        if strand == "-":
-            locations = reversed(locations)
-        for location in locations:
-            if last_start > location[1]:
-                return warnings["out_of_order"]
-            else:
-                last_start = location[1]
-        return None        
-
     def _create_ontology_event(self, ontology_type):
         """Creates the ontology_event if necessary
         Returns the index of the ontology event back."""
         if ontology_type not in self.ont_mappings:
             raise ValueError("{} is not a supported ontology".format(ontology_type))
 
-        if "event_index" not in self.ont_mappings[ontology_type]:
-            self.ont_mappings[ontology_type]['event_index'] = len(self.ontology_events)
+        if ontology_type not in self.ontology_event_index:
+            self.ontology_event_index[ontology_type] = len(self.ontology_events)
             if ontology_type == "GO":
                 ontology_ref = "KBaseOntology/gene_ontology"
             elif ontology_type == "PO":
@@ -500,129 +776,71 @@ class FastaGFFToGenome:
                 "ontology_ref": ontology_ref
             })
 
-        return self.ont_mappings[ontology_type]['event_index']
+        return self.ontology_event_index[ontology_type]
 
-    def _get_ontology_db_xrefs(self, feature):
-        """Splits the ontology info from the other db_xrefs"""
+    def _get_ontology_terms(self, terms):
+        """Creates the ontology events for a feature's (ontology, term) pairs
+        and returns its ontology_terms"""
         ontology = collections.defaultdict(dict)
-        db_xrefs = []
-        # these are keys are formatted strangely and require special parsing
-        for key in ("go_process", "go_function", "go_component"):
-            ontology_event_index = self._create_ontology_event("GO")
-            for term in feature.get(key, []):
-                sp = term.split(" - ")
-                ontology['GO'][sp[0]] = [ontology_event_index]
-                self.ontologies_present['GO'][sp[0]] = self.ont_mappings['GO'].get(sp[0], '')
-
-        # CATH terms are not distinct from EC numbers so myst be found by key
-        for term in feature.get('cath_funfam', []) + feature.get('cath', []):
-            for ref in term.split(','):
-                ontology['CATH'][ref] = [self._create_ontology_event("CATH")]
-                self.ontologies_present['CATH'][ref] = self.ont_mappings['CATH'].get(ref, '')
-
-        search_keys = ['ontology_term', 'db_xref', 'dbxref', 'product_source', 'tigrfam', 'pfam',
-                       'cog', 'go', 'po', 'ko']
-        ont_terms = []
-        # flatten out into list of values
-        for key in search_keys:
-            if key in feature:
-                ont_terms += [x for y in feature[key] for x in y.split(',')]
-
-        for ref in ont_terms:
-            if ref.startswith('GO:'):
-                ontology['GO'][ref] = [self._create_ontology_event("GO")]
-                self.ontologies_present['GO'][ref] = self.ont_mappings['GO'].get(ref, '')
-            elif ref.startswith('PO:'):
-                ontology['PO'][ref] = [self._create_ontology_event("PO")]
-                self.ontologies_present['PO'][ref] = self.ont_mappings['PO'].get(ref, '')
-            elif ref.startswith('KO:'):
-                ontology['KO'][ref] = [self._create_ontology_event("KO")]
-                self.ontologies_present['KO'][ref] = self.ont_mappings['KO'].get(ref, '')
-            elif ref.startswith('COG'):
-                ontology['COG'][ref] = [self._create_ontology_event("COG")]
-                self.ontologies_present['COG'][ref] = self.ont_mappings['COG'].get(ref, '')
-            elif ref.startswith('PF'):
-                ontology['PFAM'][ref] = [self._create_ontology_event("PFAM")]
-                self.ontologies_present['PFAM'][ref] = self.ont_mappings['PFAM'].get(ref, '')
-            elif ref.startswith('TIGR'):
-                ontology['TIGRFAM'][ref] = [self._create_ontology_event("TIGRFAM")]
-                self.ontologies_present['TIGRFAM'][ref] = self.ont_mappings['TIGRFAM'].get(ref, '')
-            else:
-                db_xrefs.append(tuple(ref.split(":", 1)))
-        return dict(ontology), db_xrefs
+        event_index = {"GO": self._create_ontology_event("GO")}
+        for ontology_type, term in terms:
+            if ontology_type not in event_index:
+                event_index[ontology_type] = self._create_ontology_event(ontology_type)
+            ontology[ontology_type][term] = [event_index[ontology_type]]
+            self.ontologies_present[ontology_type][term] = \
+                self.ont_mappings[ontology_type].get(term, '')
+        return dict(ontology)
+
+    def _extract_all(self, features):
+        """Yield _extract_feature for each feature in order. With more than
+        one parallel worker the features are extracted in batches by a pool
+        of worker processes, with a bounded number of batches in flight"""
+        if self.parallel_workers <= 1:
+            for in_feature in features:
+                yield _extract_feature(self.contig_seq, in_feature)
+            return
 
-    def _transform_feature(self, contig, in_feature):
+        logging.info(f"Transforming features with {self.parallel_workers} workers")
+        pending = deque()
+        # forking now could copy a lock held by one of the upload threads
+        with ProcessPoolExecutor(self.parallel_workers,
+                                 mp_context=multiprocessing.get_context('forkserver')) \
+                as executor:
+            for i in range(0, len(features), FEATURES_PER_BATCH):
+                batch = features[i:i + FEATURES_PER_BATCH]
+                contig_seq = self.contig_seq.subset({f['contig'] for f in batch})
+                pending.append(executor.submit(_extract_features, contig_seq, batch))
+                while len(pending) > self.parallel_workers * MAX_PENDING_BATCHES_PER_WORKER:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def _merge_feature(self, in_feature, out_feat):
         """Converts a feature from the gff ftr format into the appropriate
-        format for a genome object """
-        def _aliases(feat):
-            keys = ('locus_tag', 'old_locus_tag', 'protein_id',
-                    'transcript_id', 'gene', 'ec_number', 'gene_synonym')
-            alias_list = []
-            for key in keys:
-                if key in feat['attributes']:
-                    alias_list.extend([(key, val) for val in feat['attributes'][key]])
-            return alias_list
-
-        if in_feature['start'] < 1 or in_feature['end'] > len(contig):
+        format for a genome object. The feature has been through
+        _extract_feature, which leaves linking it to its parent and creating
+        its ontology events"""
+        if isinstance(out_feat, ValueError):
+            raise out_feat
+        if out_feat is None:
             self.warn(f"Feature with invalid location for specified contig: {in_feature}")
             if self.strict:
                 raise ValueError("Features must be completely contained within the Contig in the "
                                  f"Fasta file. Feature: in_feature")
             return
 
-        feat_seq = contig.seq[in_feature['start']-1:in_feature['end']].upper()
-        if in_feature['strand'] in {'-', '-1'}:
-            feat_seq = feat_seq.reverse_complement()
-
         # if the feature ID is duplicated (CDS or transpliced gene) we only
         # need to update the location and dna_sequence
         if in_feature.get('ID') in self.feature_dict:
-            existing = self.feature_dict[in_feature['ID']]
-            existing['location'].append(self._location(in_feature))
-            existing['dna_sequence'] = existing.get('dna_sequence', '') + str(feat_seq)
-            existing['dna_sequence_length'] = len(existing['dna_sequence'])
+            self.fragments.add(self.feature_dict[in_feature['ID']],
+                               out_feat['location'][0], out_feat['dna_sequence'])
             return
 
-        # The following is common to all the feature types
-        out_feat = {
-            "id": in_feature.get('ID'),
-            "type": in_feature['type'],
-            "location": [self._location(in_feature)],
-            "dna_sequence": str(feat_seq),
-            "dna_sequence_length": len(feat_seq),
-            "md5": hashlib.md5(str(feat_seq).encode('utf8')).hexdigest(),
-            "warnings": [],
-            "flags": [],
-        }
-
-        # add optional fields
-        if 'note' in in_feature['attributes']:
-            out_feat['note'] = in_feature['attributes']["note"][0]
-        ont, db_xrefs = self._get_ontology_db_xrefs(in_feature['attributes'])
+        ont = self._get_ontology_terms(out_feat['ontology_terms'])
         if ont:
             out_feat['ontology_terms'] = ont
-        aliases = _aliases(in_feature)
-        if aliases:
-            out_feat['aliases'] = aliases
-        if db_xrefs:
-            out_feat['db_xrefs'] = db_xrefs
-        if 'product' in in_feature['attributes']:
-            out_feat['functions'] = in_feature['attributes']["product"]
-        if 'product_name' in in_feature['attributes']:
-            if "functions" in out_feat:
-                out_feat['functions'].extend(in_feature['attributes']["product_name"])
-            else:
-                out_feat['functions'] = in_feature['attributes']["product_name"]
-        if 'function' in in_feature['attributes']:
-            out_feat['functional_descriptions'] = in_feature['attributes']["function"]
-        if 'inference' in in_feature['attributes']:
-            GenomeUtils.parse_inferences(in_feature['attributes']['inference'])
-        if 'trans-splicing' in in_feature['attributes'].get('exception', []):
-            out_feat['flags'].append('trans_splicing')
-        if 'pseudo' in in_feature['attributes'].get('exception', []):
-            out_feat['flags'].append('pseudo')
-        if 'ribosomal-slippage' in in_feature['attributes'].get('exception', []):
-            out_feat['flags'].append('ribosomal_slippage')
+        else:
+            del out_feat['ontology_terms']
         parent_id = in_feature.get('Parent', '')
         if parent_id and parent_id not in self.feature_dict:
             raise ValueError(f"Parent ID: {parent_id} was not found in feature ID list.")
@@ -709,13 +927,12 @@ class FastaGFFToGenome:
     def _process_cdss(self):
         """Because CDSs can have multiple fragments, it's necessary to go
         back over them to calculate a final protein sequence"""
-        for cds_id in self.cdss:
+        translations = get_translator(self.code_table).translate_cdss(
+            self.feature_dict[cds_id]['dna_sequence'] for cds_id in self.cdss)
+        for cds_id, (prot_seq, error) in zip(self.cdss, translations):
             cds = self.feature_dict[cds_id]
-            try:
-                prot_seq = str(Seq(cds['dna_sequence']).translate(
-                            self.code_table, cds=True).strip("*"))
-            except TranslationError as e:
-                cds['warnings'] = cds.get('warnings', []) + [str(e)]
+            if error:
+                cds['warnings'] = cds.get('warnings', []) + [error]
                 prot_seq = ""
 
             cds.update({
@@ -763,25 +980,27 @@ class FastaGFFToGenome:
 
         # construct feature location from utrs and cdss if present
         elif 'cds' in feature:
-            cds = [copy.deepcopy(self.feature_dict[feature['cds']])]
+            cds = [self.feature_dict[feature['cds']]]
             locs = []
-            seq = ""
+            seq = []
             for frag in feature.get('five_prime_UTR', []) + cds + \
                     feature.get('three_prime_UTR', []):
+                # copy the locations as merging changes their lengths
+                frag_locs = [list(loc) for loc in frag['location']]
 
                 # merge into last location if adjacent
-                if locs and abs(end(locs) - start(frag['location'])) == 1:
+                if locs and abs(end(locs) - start(frag_locs)) == 1:
                     # extend the location length by the length of the first
                     # location in the fragment
-                    first = frag['location'].pop(0)
+                    first = frag_locs.pop(0)
                     locs[-1][3] += first[3]
 
-                locs.extend(frag['location'])
-                seq += frag['dna_sequence']
+                locs.extend(frag_locs)
+                seq.append(frag['dna_sequence'])
 
             feature['location'] = locs
-            feature['dna_sequence'] = seq
-            feature['dna_sequence_length'] = len(seq)
+            feature['dna_sequence'] = "".join(seq)
+            feature['dna_sequence_length'] = len(feature['dna_sequence'])
 
         # remove these properties as they are no longer needed
         for x in ['five_prime_UTR', 'three_prime_UTR', 'exon']:
@@ -791,7 +1010,7 @@ class FastaGFFToGenome:
             ValueError('Feature {feature["id"]} must contain either exon or cds data to '
                        'construct an accurate location and sequence')
 
-    def _gen_genome_info(self, assembly_ref, assembly, input_gff_file, molecule_type, params):
+    def _gen_genome_info(self, assembly_ref, assembly, gff_handle_ref, molecule_type, params):
         """
         _gen_genome_info: generate genome info
 
@@ -813,41 +1032,49 @@ class FastaGFFToGenome:
             'ontology_events': self.ontology_events,
         }
 
-        genome['contig_ids'], genome['contig_lengths'] = zip(
-            *[(k, v['length']) for k, v in assembly['contigs'].items()])
+        contigs = ContigIndex.from_assembly(assembly)
+        genome['contig_ids'], genome['contig_lengths'] = contigs.ids, contigs.lengths
         genome['source'], genome['genome_tiers'] = self.gi.determine_tier(params.get('source'))
-        genome.update(self.gi.retrieve_taxon(self.taxon_wsname,
-                                             genome['scientific_name'],
-                                             params.get('taxon_id'))._asdict())
+        with self.timer.phase('retrieve_taxon'):
+            genome.update(self.gi.retrieve_taxon(self.taxon_wsname,
+                                                 genome['scientific_name'],
+                                                 params.get('taxon_id'))._asdict())
 
         # handle optional fields
         for key in ('release', 'genetic_code', 'genome_type', 'source_id'):
             if params.get(key):
                 genome[key] = params[key]
 
-        # Phytozome gff files are not compatible with the RNASeq Pipeline
-        # so it's better to build from the object than cache the file
-        if self.is_phytozome:
-            gff_file_to_shock = self.dfu.file_to_shock(
-                {'file_path': input_gff_file, 'make_handle': 1, 'pack': "gzip"})
-            genome['gff_handle_ref'] = gff_file_to_shock['handle']['hid']
+        if gff_handle_ref:
+            genome['gff_handle_ref'] = gff_handle_ref
 
         for feature in self.feature_dict.values():
-            self.feature_counts[feature['type']] += 1
             if 'exon' in feature or feature['type'] == 'mRNA':
                 self._update_from_exons(feature)
-
-            # Test if location order is in order.
+        locations = LocationTable(contigs, (feature['location']
+                                            for feature in self.feature_dict.values()))
+
+        # the location checks run over all the features at once
+        location_checks = zip(locations.part_counts(), locations.mixed_strands(),
+                              locations.out_of_order(), locations.single_contig(),
+                              locations.spans_contig())
+        for feature, checks in zip(self.feature_dict.values(), location_checks):
+            self.feature_counts[feature['type']] += 1
+            parts, mixed_strands, out_of_order, single_contig, spans_contig = checks
+            location_warnings = []
             is_transpliced = "flags" in feature and "trans_splicing" in feature["flags"]
-            if not is_transpliced and len(feature["location"]) > 1:
-                # Check the order only if not trans_spliced and has more than 1 location.
-                location_warning = self._check_location_order(feature["location"])
-                if location_warning is not None:
-                    feature["warnings"] = feature.get('warnings', []) + [location_warning]
-
-            contig_len = genome["contig_lengths"][genome["contig_ids"].index(feature["location"][0][0])]
-            feature = check_full_contig_length_or_multi_strand_feature(
-                feature, is_transpliced, contig_len, self.skip_types)
+            # Check the order only if not trans_spliced and has more than 1 location.
+            if not is_transpliced and parts > 1:
+                if mixed_strands:
+                    location_warnings.append(warnings["both_strand_coordinates"])
+                elif out_of_order:
+                    location_warnings.append(warnings["out_of_order"])
+            if spans_contig and feature['type'] not in self.skip_types:
+                location_warnings.append(warnings["contig_length_feature"])
+            if single_contig and mixed_strands and not is_transpliced:
+                location_warnings.append(warnings["both_strand_coordinates"])
+            if location_warnings:
+                feature["warnings"] = feature.get('warnings', []) + location_warnings
 
             # sort features into their respective arrays
             if feature['type'] == 'CDS':
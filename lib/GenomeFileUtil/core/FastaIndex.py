@@ -0,0 +1,170 @@
+"""
+Random access to the sequences of a FASTA file through a samtools
+compatible .fai index.
+"""
+import logging
+import mmap
+import os
+
+from GenomeFileUtil.core.ContigStore import complement_table
+
+# line breaks and blank lines allowed after the last sequence of an indexed file
+MAX_TRAILING_BYTES = 4096
+
+
+class UnindexableFasta(ValueError):
+    """The FASTA file can't be described by a .fai index: text before the
+    first header, unnamed sequences, whitespace inside sequence lines or
+    sequence lines of uneven length"""
+
+
+def build_fai(fasta_file, index_file):
+    """Write a .fai index of fasta_file: one line per sequence of name,
+    length, byte offset of the sequence, bases per line and bytes per line"""
+    entries = []
+    current = None
+    last_line_short = False
+    offset = 0
+    with open(fasta_file, 'rb', buffering=2**20) as fasta:
+        for line in fasta:
+            line_start = offset
+            offset += len(line)
+            if line.startswith(b">"):
+                name = line[1:].split(None, 1)
+                if not name:
+                    raise UnindexableFasta(f"A sequence has no name at byte {line_start} "
+                                           f"of {fasta_file}")
+                current = [name[0].decode(), 0, offset, 0, 0]
+                entries.append(current)
+                last_line_short = False
+                continue
+            sequence = line.rstrip(b"\r\n")
+            bases = len(sequence)
+            if current is None:
+                if bases:
+                    raise UnindexableFasta(f"{fasta_file} does not start with a FASTA header")
+                continue
+            if b" " in sequence or b"\t" in sequence:
+                # the index would count the whitespace as bases
+                raise UnindexableFasta(f"{current[0]} has whitespace in its sequence "
+                                       f"at byte {line_start} of {fasta_file}")
+            if not bases:
+                # blank lines may only follow a sequence
+                last_line_short = True
+                continue
+            if not current[3]:
+                current[3], current[4] = bases, len(line)
+            elif last_line_short or bases > current[3] or \
+                    (bases == current[3] and len(line) != current[4]):
+                raise UnindexableFasta(f"{current[0]} has sequence lines of uneven length "
+                                       f"at byte {line_start} of {fasta_file}")
+            last_line_short = bases < current[3]
+            current[1] += bases
+    with open(index_file, 'w') as out:
+        for entry in entries:
+            out.write("\t".join(str(x) for x in entry) + "\n")
+
+
+class FastaIndex:
+    """Extracts sequence slices from a FASTA file by mmap slicing only the
+    lines they span. The index is built next to the file unless a current
+    one is already there.
+
+    Coordinates are 0-based and end exclusive, like python slices."""
+
+    def __init__(self, fasta_file):
+        self.path = fasta_file
+        self.index_file = fasta_file + ".fai"
+        if not self._index_is_current():
+            logging.info(f"Indexing {fasta_file}")
+            build_fai(fasta_file, self.index_file)
+        self._contigs = {}
+        with open(self.index_file) as index:
+            for line in index:
+                name, length, offset, line_bases, line_width = line.split("\t")[:5]
+                if name in self._contigs:
+                    raise ValueError(f"Duplicate contig ID: {name}")
+                self._contigs[name] = (int(length), int(offset), int(line_bases),
+                                       int(line_width))
+        self._file = None
+        self._mmap = None
+
+    def __getstate__(self):
+        # the mapping can't cross process boundaries; it is reopened lazily
+        state = self.__dict__.copy()
+        state.update({'_file': None, '_mmap': None})
+        return state
+
+    def subset(self, contig_ids):
+        """A view of some of the contigs that is cheap to send to a worker
+        process"""
+        view = FastaIndex.__new__(FastaIndex)
+        view.__dict__.update(self.__getstate__())
+        view._contigs = {c: self._contigs[c] for c in contig_ids}
+        return view
+
+    def _index_is_current(self):
+        """Whether the index is newer than the FASTA file and its last
+        sequence ends where the file does, but for line breaks"""
+        try:
+            if os.path.getmtime(self.index_file) < os.path.getmtime(self.path):
+                return False
+            last = None
+            with open(self.index_file) as index:
+                for last in index:
+                    pass
+            if last is None:
+                return False
+            length, offset, line_bases, line_width = (int(x) for x in last.split("\t")[1:5])
+            end = offset
+            if line_bases:
+                end += length // line_bases * line_width + length % line_bases
+            size = os.path.getsize(self.path)
+            if not end <= size <= end + MAX_TRAILING_BYTES:
+                return False
+            with open(self.path, 'rb') as fasta:
+                fasta.seek(end)
+                return not fasta.read().strip()
+        except (OSError, ValueError):
+            return False
+
+    def __contains__(self, contig_id):
+        return contig_id in self._contigs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def keys(self):
+        return self._contigs.keys()
+
+    def length(self, contig_id):
+        return self._contigs[contig_id][0]
+
+    def _offset(self, contig_id, pos):
+        length, offset, line_bases, line_width = self._contigs[contig_id]
+        return offset + pos // line_bases * line_width + pos % line_bases
+
+    def get(self, contig_id, start, end, strand='+'):
+        """Extract a sequence slice in upper case, reverse complemented for
+        the - strand"""
+        length = self.length(contig_id)
+        start, end = max(int(start), 0), min(int(end), length)
+        if start >= end:
+            return ""
+        if self._mmap is None:
+            self._file = open(self.path, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        seq = self._mmap[self._offset(contig_id, start):self._offset(contig_id, end)]
+        seq = seq.translate(None, b"\r\n").upper()
+        if strand == '-':
+            return seq.translate(complement_table)[::-1].decode('ascii')
+        return seq.decode('ascii')
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
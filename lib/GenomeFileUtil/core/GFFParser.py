@@ -0,0 +1,178 @@
+"""
+Streaming GFF3 and GTF reader for the FASTA+GFF importer.
+
+Records keep their attribute column as the raw string and only split and
+unquote it when the attributes are first used.
+"""
+import logging
+import re
+import sys
+import urllib.parse as parse
+from functools import lru_cache
+
+snake_re = re.compile('((?<=[a-z0-9])[A-Z]|(?!^)[A-Z](?=[a-z]))')
+
+
+def make_snake_case(string):
+    """Simple function to convert CamelCase to snake_case"""
+    return snake_re.sub(r'_\1', string).lower()
+
+
+# the same few attribute keys occur on every line of a file
+normalize_key = lru_cache(maxsize=4096)(make_snake_case)
+
+
+def _split_attribute(attribute):
+    """(key, value) of one attribute, or None if it can't be parsed"""
+    attribute = attribute.strip()
+    # Sometimes empty string
+    if not attribute:
+        return None
+    # Use of 1 to limit split as '=' character can also be made available later
+    # Sometimes lack of "=", assume spaces instead
+    if "=" in attribute:
+        key, value = attribute.split("=", 1)
+    elif " " in attribute:
+        key, value = attribute.split(" ", 1)
+    else:
+        logging.debug(f'Unable to parse {attribute}')
+        return None
+    value = value.strip('"')
+    if '%' in value:
+        value = parse.unquote(value)
+    return normalize_key(key), value
+
+
+def parse_attributes(raw):
+    """Decode an attribute column into a dict of snake_case key -> values"""
+    attributes = {}
+    for attribute in raw.split(";"):
+        pair = _split_attribute(attribute)
+        if pair is not None:
+            attributes.setdefault(pair[0], []).append(pair[1])
+    return attributes
+
+
+def _identifiers(raw):
+    """The first id and parent values of an attribute column, found without
+    keeping the rest of the column"""
+    ident = parent = None
+    for attribute in raw.split(";"):
+        # only id and parent keys are worth splitting, which matters for GTF
+        # where no key is
+        head = attribute.lstrip()[:6].lower()
+        if not (head.startswith('id') or head == 'parent'):
+            continue
+        pair = _split_attribute(attribute)
+        if pair is None:
+            continue
+        if pair[0] == 'id' and ident is None:
+            ident = pair[1]
+        elif pair[0] == 'parent' and parent is None:
+            parent = pair[1]
+    return ident, parent
+
+
+def gtf_identifiers(raw):
+    """The gene_id and transcript_id of a GTF attribute column, empty when
+    the line doesn't give one"""
+    gene_id = transcript_id = None
+    for attribute in raw.split(";"):
+        pair = _split_attribute(attribute)
+        if pair is None:
+            continue
+        if pair[0] == 'gene_id' and gene_id is None:
+            gene_id = pair[1]
+        elif pair[0] == 'transcript_id' and transcript_id is None:
+            transcript_id = pair[1]
+        # both lead the column in GTF, so the rest needn't be split
+        if gene_id is not None and transcript_id is not None:
+            break
+    return gene_id or '', transcript_id or ''
+
+
+def is_gtf_record(record):
+    """Whether a line is GTF, which gives its gene_id as a space separated
+    pair where GFF3 has key=value pairs. None for a line without
+    attributes, which can't tell the two apart"""
+    raw = record.raw.strip()
+    if not raw or raw == '.':
+        return None
+    for attribute in raw.split(";"):
+        key = attribute.strip().split(None, 1)[:1]
+        if key == ['gene_id']:
+            return True
+    return False
+
+
+class GFFRecord:
+    """One line of a GFF file. Fields can also be read and set with the
+    dict style access the importer has always used on features, and
+    'ID' and 'Parent' are only "in" a record when they are set."""
+    __slots__ = ('contig', 'source', 'type', 'start', 'end', 'score', 'strand',
+                 'phase', 'raw', '_attributes', 'ID', 'Parent')
+
+    def __init__(self, contig, source, type, start, end, score, strand, phase, raw):
+        self.contig = contig
+        self.source = source
+        self.type = type
+        self.start = start
+        self.end = end
+        self.score = score
+        self.strand = strand
+        self.phase = phase
+        self.raw = raw
+        self._attributes = None
+        self.ID, self.Parent = _identifiers(raw)
+
+    @property
+    def attributes(self):
+        if self._attributes is None:
+            self._attributes = parse_attributes(self.raw)
+        return self._attributes
+
+    def __getitem__(self, key):
+        if key not in self.__slots__ and key != 'attributes':
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return (key in self.__slots__ or key == 'attributes') and \
+            getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return repr({'contig': self.contig, 'source': self.source, 'type': self.type,
+                     'start': self.start, 'end': self.end, 'strand': self.strand,
+                     'ID': self.ID, 'Parent': self.Parent, 'attributes': self.raw.rstrip()})
+
+
+def iter_gff(input_gff_file):
+    """Yield a GFFRecord for each feature line of a GFF3 or GTF file"""
+    intern = sys.intern
+    with open(input_gff_file, buffering=2**20) as gff:
+        for line in gff:
+            if line.isspace() or line.startswith("#"):
+                continue
+            try:
+                (contig_id, source_id, feature_type, start, end,
+                 score, strand, phase, attributes) = line.split('\t')
+                start, end = int(start), int(end)
+            except ValueError:
+                raise ValueError(f"unable to parse {line}")
+            yield GFFRecord(intern(contig_id), intern(source_id), intern(feature_type),
+                            start, end, intern(score), intern(strand), intern(phase),
+                            attributes)
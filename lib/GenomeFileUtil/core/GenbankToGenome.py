@@ -1,30 +1,160 @@
 import copy
 import datetime
 import hashlib
+import multiprocessing
 import os
 import re
 import shutil
 import sys
 import time
 import uuid
-from collections import Counter, defaultdict, OrderedDict
+from collections import Counter, defaultdict, deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import logging
 
 import Bio.SeqIO
 import Bio.SeqUtils
-from Bio import Seq
 from Bio.Data.CodonTable import TranslationError
 from Bio.SeqFeature import ExactPosition
 
 from installed_clients.AssemblyUtilClient import AssemblyUtil
 from installed_clients.DataFileUtilClient import DataFileUtil
+from GenomeFileUtil.core.ContigStore import ContigStore
 from GenomeFileUtil.core.GenomeInterface import GenomeInterface
 from GenomeFileUtil.core.GenomeUtils import is_parent, propagate_cds_props_to_gene, warnings
+from GenomeFileUtil.core.GenomeUtils import ParentIndex, SkipEmptyLinesReader
 from GenomeFileUtil.core.GenomeUtils import parse_inferences, load_ontology_mappings
+from GenomeFileUtil.core.OntologyClassifier import go_terms, split_db_xrefs
+from GenomeFileUtil.core.PhaseTimer import PhaseTimer
+from GenomeFileUtil.core.Translator import get_translator
 from installed_clients.WorkspaceClient import Workspace
 
 MAX_MISC_FEATURE_SIZE = 10000
-MAX_PARENT_LOOKUPS = 5
+MAX_PENDING_RECORDS_PER_WORKER = 4
+GO_QUALIFIERS = ("GO_process", "GO_function", "GO_component")
+
+
+def _get_seq(contig_seq, feat, contig):
+    """Extract the DNA sequence for a feature"""
+    seq = []
+    for part in feat.location.parts:
+        strand = part.strand
+        # handle trans-splicing across contigs
+        if part.ref:
+            part_contig = part.ref
+        else:
+            part_contig = contig
+
+        seq.append(contig_seq.get(part_contig, part.start, part.end,
+                                  '+' if strand >= 0 else '-'))
+    return "".join(seq)
+
+
+def _location(feat, contig):
+    """Convert to KBase style location objects"""
+    strand_trans = ("", "+", "-")
+    loc = []
+    for part in feat.location.parts:
+        contig_id = part.ref if part.ref else contig
+        if part.strand >= 0:
+            begin = int(part.start) + 1
+        else:
+            begin = int(part.end)
+        loc.append((
+                contig_id,
+                begin,
+                strand_trans[part.strand],
+                len(part)))
+    return loc
+
+
+def _split_ontology_db_xrefs(feat):
+    """Splits the ontology terms from the other db_xrefs of a feature.
+    Returns a list of (ontology, term) pairs in the order they were found and
+    the sorted db_xrefs"""
+    terms = []
+    for key in GO_QUALIFIERS:
+        terms += go_terms(feat.qualifiers.get(key, []))
+    ref_terms, db_xrefs = split_db_xrefs(feat.qualifiers.get('db_xref', []))
+    return terms + ref_terms, sorted(db_xrefs)
+
+
+def _extract_record_features(contig_seq, code_table, source, excluded_features,
+                             record_id, record_length, features):
+    """Does all the work on a record's features that doesn't depend on the
+    features of other records: location, sequence, md5, qualifier parsing,
+    ontology split-out and CDS translation. This is run in worker processes
+    when the features are parsed in parallel and the results are merged into
+    the genome in record order by GenbankToGenome._merge_features"""
+    translator = get_translator(code_table)
+    skipped = Counter()
+    parsed = []
+    for in_feature in features:
+        if in_feature.type in excluded_features:
+            skipped[in_feature.type] += 1
+            continue
+        feat_seq = _get_seq(contig_seq, in_feature, record_id)
+        if source == "Ensembl":
+            tags = ['gene', 'locus_tag']
+        else:
+            tags = ['locus_tag', 'kbase_id']
+        tag_id = ""
+        for t in tags:
+            tag_id = in_feature.qualifiers.get(t, [""])[0]
+            if tag_id:
+                break
+
+        out_feat = {
+            "location": _location(in_feature, record_id),
+            "dna_sequence": feat_seq,
+            "dna_sequence_length": len(feat_seq),
+            "md5": hashlib.md5(feat_seq.encode('utf8')).hexdigest(),
+        }
+        feature = {
+            'type': in_feature.type,
+            'tag_id': tag_id,
+            'tags': tags,
+            'out_feat': out_feat,
+            # note that end is the larger number regardless of strand
+            'off_end': int(in_feature.location.end) > record_length,
+            'in_order': out_feat['location'] == sorted(
+                out_feat['location'], reverse=(in_feature.location.strand == -1)),
+            'spans_record': in_feature.location.start == 0 and
+                            in_feature.location.end == record_length,
+        }
+        if not tag_id and in_feature.type == 'gene':
+            feature['description'] = str(in_feature)
+        parsed.append(feature)
+        if feature['off_end']:
+            continue
+
+        for piece in in_feature.location.parts:
+            if not isinstance(piece.start, ExactPosition) \
+                    or not isinstance(piece.end, ExactPosition):
+                out_feat['warnings'] = [warnings["non_exact_coordinates"]]
+
+        # add optional fields
+        if 'note' in in_feature.qualifiers:
+            out_feat['note'] = in_feature.qualifiers["note"][0]
+
+        out_feat.update(GenbankToGenome._get_aliases_flags_functions(in_feature))
+
+        feature['ontology_terms'], db_xrefs = _split_ontology_db_xrefs(in_feature)
+        if db_xrefs:
+            out_feat['db_xrefs'] = db_xrefs
+
+        if 'inference' in in_feature.qualifiers:
+            out_feat['inference_data'] = parse_inferences(
+                in_feature.qualifiers['inference'])
+
+        if in_feature.type == 'CDS':
+            feature['prot_seq'] = in_feature.qualifiers.get("translation", [""])[0]
+            try:
+                feature['translation'] = translator.translate_cds(feat_seq)
+            except TranslationError as e:
+                feature['translation_error'] = str(e)
+
+    return skipped, parsed
 
 
 class GenbankToGenome:
@@ -33,7 +163,7 @@ class GenbankToGenome:
         self.gi = GenomeInterface(config)
         self.dfu = DataFileUtil(config.callbackURL)
         self.aUtil = AssemblyUtil(config.callbackURL)
-        self.ws = Workspace(config.workspaceURL)
+        self.ws = Workspace(config.workspaceURL, token=config.token)
         self._messages = []
         self.time_string = str(datetime.datetime.fromtimestamp(
             time.time()).strftime('%Y_%m_%d_%H_%M_%S'))
@@ -41,16 +171,20 @@ class GenbankToGenome:
         self.version = re.search("module-version:\n\W+(.+)\n", yml_text).group(1)
         self.generate_parents = False
         self.generate_ids = False
+        self.parallel_workers = 1
+        self.timer = PhaseTimer()
         self.genes = OrderedDict()
+        self.gene_index = ParentIndex()
         self.mrnas = OrderedDict()
         self.cdss = OrderedDict()
         self.noncoding = []
         self.ontologies_present = defaultdict(dict)
         self.ontology_events = list()
+        self.ontology_event_index = {}
         self.skiped_features = Counter()
         self.feature_counts = Counter()
         self.orphan_types = Counter()
-        self.contig_seq = {}
+        self.contig_seq = ContigStore(config.sharedFolder)
         self.circ_contigs = set()
         self.features_spaning_zero = set()
         self.genome_warnings = []
@@ -84,20 +218,23 @@ class GenbankToGenome:
         self.validate_params(params)
 
         # 2) construct the input directory staging area
-        input_directory = self.stage_input(params)
+        self.timer.log_file = PhaseTimer.log_path(self.cfg.sharedFolder, params['genome_name'])
+        with self.timer.phase('stage_input'):
+            input_directory = self.stage_input(params)
 
         # 3) update default params
         self.default_params.update(params)
         params = self.default_params
         self.generate_parents = params.get('generate_missing_genes')
         self.generate_ids = params.get('generate_ids_if_needed')
+        if params.get('parallel_workers'):
+            self.parallel_workers = params['parallel_workers']
         if params.get('genetic_code'):
             self.code_table = params['genetic_code']
 
         # 4) Do the upload
         files = self._find_input_files(input_directory)
-        consolidated_file = self._join_files_skip_empty_lines(files)
-        genome = self.parse_genbank(consolidated_file, params)
+        genome = self.parse_genbank(files, params)
         if params.get('genetic_code'):
             genome["genetic_code"] = params['genetic_code']
 
@@ -106,7 +243,7 @@ class GenbankToGenome:
             'name': params['genome_name'],
             'data': genome,
             "meta": params['metadata'],
-        })
+        }, timer=self.timer)
         ref = f"{result['info'][6]}/{result['info'][0]}/{result['info'][4]}"
         logging.info(f"Genome saved to {ref}")
 
@@ -117,7 +254,8 @@ class GenbankToGenome:
         info = result['info']
         details = {
             'genome_ref': ref,
-            'genome_info': info
+            'genome_info': info,
+            'timings': self.timer.timings,
         }
 
         return details
@@ -146,6 +284,9 @@ class GenbankToGenome:
         if params.get('genetic_code'):
             if not (isinstance(params['genetic_code'], int) and 0 < params['genetic_code'] < 32):
                 raise ValueError(f"Invalid genetic code specified: {params}")
+        if params.get('parallel_workers'):
+            if not (isinstance(params['parallel_workers'], int) and params['parallel_workers'] > 0):
+                raise ValueError(f"Invalid parallel_workers specified: {params}")
 
     def stage_input(self, params):
         """ Setup the input_directory by fetching the files and uncompressing if needed. """
@@ -201,26 +342,25 @@ class GenbankToGenome:
 
         return input_directory
 
-    def parse_genbank(self, file_path, params):
-        logging.info("Saving original file to shock")
-        shock_res = self.dfu.file_to_shock({
-            'file_path': file_path,
-            'make_handle': 1,
-            'pack': 'gzip',
-        })
-        # Write and save assembly file
-        assembly_ref = self._save_assembly(file_path, params)
-        assembly_data = self.dfu.get_objects(
-            {'object_refs': [assembly_ref],
-             'ignore_errors': 0})['data'][0]['data']
+    def parse_genbank(self, input_files, params):
+        file_path = self._original_file(input_files)
+        # the uploads only wait on the callback service, so they run in
+        # threads while the records are parsed
+        io_executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            return self._parse_genbank(input_files, params, file_path, io_executor)
+        finally:
+            io_executor.shutdown()
+            # a supplied assembly is verified against the stored contigs, so
+            # the store is released once the uploads have finished
+            self.contig_seq.close()
+
+    def _parse_genbank(self, input_files, params, file_path, io_executor):
+        shock_future = io_executor.submit(self._save_original_file, file_path)
         genome = {
             "id": params['genome_name'],
             "original_source_file_name": os.path.basename(file_path),
-            "assembly_ref": assembly_ref,
-            "gc_content": assembly_data['gc_content'],
-            "dna_size": assembly_data['dna_size'],
-            "md5": assembly_data['md5'],
-            "genbank_handle_ref": shock_res['handle']['hid'],
+            "genbank_handle_ref": None,
             "publications": set(),
             "contig_ids": [],
             "contig_lengths": [],
@@ -231,39 +371,110 @@ class GenbankToGenome:
         if params.get('genome_type'):
             genome['genome_type'] = params['genome_type']
 
+        existing_assembly_ref = params.get("use_existing_assembly")
+        if existing_assembly_ref and not re.match("\d+\/\d+\/\d+", existing_assembly_ref):
+            raise ValueError(f"Assembly ref: {existing_assembly_ref} is not a valid format. Must"
+                             f" be in numerical <ws>/<object>/<version> format.")
+
+        # The genbank file is parsed exactly once: each record supplies the
+        # contig sequence, the assembly FASTA and the features in turn
+        fasta_file = None
+        fasta_handle = None
+        if not existing_assembly_ref:
+            fasta_file = f"{self.cfg.sharedFolder}/{params['genome_name']}_assembly.fasta"
+            fasta_handle = open(fasta_file, 'w', buffering=2 ** 20)
+        contig_info = defaultdict(dict)
+        deferred_records = []
         dates = []
-        # Parse data from genbank file
-        contigs = Bio.SeqIO.parse(file_path, "genbank")
-        for record in contigs:
-            r_annot = record.annotations
-            logging.info("parsing contig: " + record.id)
+        # in parallel mode features are extracted by worker processes and
+        # merged back in record order as the results come in
+        executor = None
+        pending = deque()
+        if self.parallel_workers > 1:
+            logging.info(f"Parsing features with {self.parallel_workers} workers")
+            # the upload threads are already running, so workers come from a
+            # forkserver rather than a fork of this process that could copy a
+            # lock one of those threads holds
+            executor = ProcessPoolExecutor(self.parallel_workers,
+                                           mp_context=multiprocessing.get_context('forkserver'))
+        # empty lines are dropped as the files are read rather than written
+        # out to a cleaned copy first
+        genbank_stream = SkipEmptyLinesReader(input_files)
+        with self.timer.phase('parse_records') as phase:
             try:
-                dates.append(time.strptime(r_annot.get('date'), "%d-%b-%Y"))
-            except (TypeError, ValueError):
-                pass
-            genome['contig_ids'].append(record.id)
-            genome['contig_lengths'].append(len(record))
-            genome["publications"] |= self._get_pubs(r_annot)
-
-            # only do the following once(on the first contig)
-            if "source_id" not in genome:
-                genome["source_id"] = record.id.split('.')[0]
-                organism = r_annot.get('organism', 'Unknown Organism')
-                if params.get('scientific_name'):
-                    genome['scientific_name'] = params['scientific_name']
-                else:
-                    genome['scientific_name'] = organism
-                genome.update(self.gi.retrieve_taxon(params['taxon_wsname'],
-                                                     genome['scientific_name'],
-                                                     params.get('taxon_id'))._asdict())
-                self.code_table = genome['genetic_code']
-                genome["molecule_type"] = r_annot.get('molecule_type', 'DNA')
-                genome['notes'] = r_annot.get('comment', "").replace('\\n', '\n')
-
-            self._parse_features(record, params['source'])
+                for record in Bio.SeqIO.parse(genbank_stream, "genbank"):
+                    r_annot = record.annotations
+                    logging.info("parsing contig: " + record.id)
+                    self._load_contig(record, contig_info)
+                    if fasta_handle:
+                        Bio.SeqIO.write(record, fasta_handle, "fasta")
+                    try:
+                        dates.append(time.strptime(r_annot.get('date'), "%d-%b-%Y"))
+                    except (TypeError, ValueError):
+                        pass
+                    genome['contig_ids'].append(record.id)
+                    genome['contig_lengths'].append(len(record))
+                    genome["publications"] |= self._get_pubs(r_annot)
+
+                    # only do the following once(on the first contig)
+                    if "source_id" not in genome:
+                        genome["source_id"] = record.id.split('.')[0]
+                        organism = r_annot.get('organism', 'Unknown Organism')
+                        if params.get('scientific_name'):
+                            genome['scientific_name'] = params['scientific_name']
+                        else:
+                            genome['scientific_name'] = organism
+                        with self.timer.phase('retrieve_taxon'):
+                            genome.update(self.gi.retrieve_taxon(params['taxon_wsname'],
+                                                                 genome['scientific_name'],
+                                                                 params.get('taxon_id'))._asdict())
+                        self.code_table = genome['genetic_code']
+                        genome["molecule_type"] = r_annot.get('molecule_type', 'DNA')
+                        genome['notes'] = r_annot.get('comment', "").replace('\\n', '\n')
+
+                    # trans-spliced features may point at a contig later in the
+                    # file, so those records wait until every sequence is loaded.
+                    # Every record after the first deferred one waits as well so
+                    # features are still merged in file order.
+                    if deferred_records or \
+                            self._referenced_contigs(record) - self.contig_seq.keys():
+                        deferred_records.append(record)
+                    else:
+                        self._parse_features(record, params['source'], executor, pending)
+                # every sequence has been read, so the assembly is saved while
+                # the remaining features are processed
+                if fasta_handle:
+                    fasta_handle.close()
+                    fasta_handle = None
+                assembly_future = io_executor.submit(self._save_assembly_data, fasta_file,
+                                                     contig_info, params)
+                while pending:
+                    self._merge_pending(pending)
+            finally:
+                genbank_stream.close()
+                if fasta_handle:
+                    fasta_handle.close()
+                if executor:
+                    executor.shutdown()
+
+            for record in deferred_records:
+                self._parse_features(record, params['source'])
+
+            phase['features'] = sum(len(f) for f in (self.genes, self.mrnas, self.cdss,
+                                                     self.noncoding))
 
         genome.update(self.get_feature_lists())
 
+        with self.timer.phase('wait_for_uploads'):
+            genome["genbank_handle_ref"] = shock_future.result()['handle']['hid']
+            assembly_ref, assembly_data = assembly_future.result()
+        genome.update({
+            "assembly_ref": assembly_ref,
+            "gc_content": assembly_data['gc_content'],
+            "dna_size": assembly_data['dna_size'],
+            "md5": assembly_data['md5'],
+        })
+
         genome['num_contigs'] = len(genome['contig_ids'])
         # add dates
         dates.sort()
@@ -310,61 +521,78 @@ class GenbankToGenome:
         logging.info(f"Feature Counts: {genome['feature_counts']}")
         return genome
 
-    def _save_assembly(self, genbank_file, params):
-        """Convert genbank file to fasta and sve as assembly"""
-        contigs = Bio.SeqIO.parse(genbank_file, "genbank")
-        assembly_id = f"{params['genome_name']}_assembly"
-        fasta_file = f"{self.cfg.sharedFolder}/{params['genome_name']}_assembly.fasta"
-
-        out_contigs = []
-        extra_info = defaultdict(dict)
-        for in_contig in contigs:
-            if in_contig.annotations.get('topology', "") == 'circular':
-                extra_info[in_contig.id]['is_circ'] = 1
-                self.circ_contigs.add(in_contig.id)
-            elif in_contig.annotations.get('topology', "") == 'linear':
-                extra_info[in_contig.id]['is_circ'] = 0
-            out_contigs.append(in_contig)
-            self.contig_seq[in_contig.id] = in_contig.seq.upper()
+    def _load_contig(self, record, contig_info):
+        """Record the topology and sequence of a genbank record"""
+        if record.annotations.get('topology', "") == 'circular':
+            contig_info[record.id]['is_circ'] = 1
+            self.circ_contigs.add(record.id)
+        elif record.annotations.get('topology', "") == 'linear':
+            contig_info[record.id]['is_circ'] = 0
+        self.contig_seq.add(record.id, record.seq)
 
+    @staticmethod
+    def _referenced_contigs(record):
+        """Get the ids of other contigs referenced by trans-spliced features"""
+        return {part.ref for feat in record.features
+                for part in feat.location.parts if part.ref}
+
+    def _save_original_file(self, file_path):
+        logging.info("Saving original file to shock")
+        with self.timer.phase('file_to_shock'):
+            return self.dfu.file_to_shock({
+                'file_path': file_path,
+                'make_handle': 1,
+                'pack': 'gzip',
+            })
+
+    def _save_assembly_data(self, fasta_file, contig_info, params):
+        """Save the assembly and fetch the fields of it the genome copies"""
+        with self.timer.phase('save_assembly'):
+            assembly_ref = self._save_assembly(fasta_file, contig_info, params)
+            assembly_data = self.ws.get_objects2({'objects': [
+                {'ref': assembly_ref, 'included': ['gc_content', 'dna_size', 'md5']}]}
+            )['data'][0]['data']
+        return assembly_ref, assembly_data
+
+    def _save_assembly(self, fasta_file, contig_info, params):
+        """Save the fasta written from the genbank records as an assembly or
+        verify the contigs against the supplied assembly"""
         assembly_ref = params.get("use_existing_assembly")
         if assembly_ref:
-            if not re.match("\d+\/\d+\/\d+", assembly_ref):
-                raise ValueError(f"Assembly ref: {assembly_ref} is not a valid format. Must"
-                                 f" be in numerical <ws>/<object>/<version> format.")
-            ret = self.dfu.get_objects(
-                {'object_refs': [assembly_ref]}
-            )['data'][0]
-            if "KBaseGenomeAnnotations.Assembly" not in ret['info'][2]:
-                raise ValueError(f"{assembly_ref} is not a reference to an assembly")
-            unmatched_ids = list()
-            unmatched_ids_md5s = list()
-            for current_contig in self.contig_seq.keys():
-                current_contig_md5 = hashlib.md5(
-                    str(self.contig_seq[current_contig]).encode('utf8')
-                ).hexdigest()
-                if current_contig in ret['data']['contigs']:
-                    if current_contig_md5 != ret['data']['contigs'][current_contig]['md5']:
-                        unmatched_ids_md5s.append(current_contig)
-                else:
-                    unmatched_ids.append(current_contig)
-            if len(unmatched_ids) > 0:
-                raise ValueError(warnings['assembly_ref_extra_contigs'].format(", ".join(unmatched_ids)))
-            if len(unmatched_ids_md5s) > 0:
-                raise ValueError(warnings["assembly_ref_diff_seq"].format(", ".join(unmatched_ids_md5s)))
+            self._verify_assembly_contigs(assembly_ref)
             logging.info(f"Using supplied assembly: {assembly_ref}")
             return assembly_ref
         logging.info("Saving sequence as Assembly object")
-        Bio.SeqIO.write(out_contigs, fasta_file, "fasta")
         assembly_ref = self.aUtil.save_assembly_from_fasta(
             {'file': {'path': fasta_file},
              'workspace_name': params['workspace_name'],
-             'assembly_name': assembly_id,
+             'assembly_name': f"{params['genome_name']}_assembly",
              'type': params.get('genome_type', 'isolate'),
-             'contig_info': extra_info})
+             'contig_info': contig_info})
         logging.info(f"Assembly saved to {assembly_ref}")
         return assembly_ref
 
+    def _verify_assembly_contigs(self, assembly_ref):
+        """Check every contig of the genbank file is in the supplied assembly
+        with the same sequence. Only the contig md5s of the assembly are
+        fetched, and the contigs are hashed in a thread pool."""
+        ret = self.ws.get_objects2({'objects': [
+            {'ref': assembly_ref, 'included': ['contigs/*/md5']}]})['data'][0]
+        if "KBaseGenomeAnnotations.Assembly" not in ret['info'][2]:
+            raise ValueError(f"{assembly_ref} is not a reference to an assembly")
+        assembly_contigs = ret['data'].get('contigs', {})
+        unmatched_ids = [c for c in self.contig_seq.keys() if c not in assembly_contigs]
+        if unmatched_ids:
+            raise ValueError(warnings['assembly_ref_extra_contigs'].format(", ".join(unmatched_ids)))
+
+        contigs = list(self.contig_seq.keys())
+        with ThreadPoolExecutor() as executor:
+            md5s = executor.map(self.contig_seq.md5, contigs)
+            unmatched_ids_md5s = [contig for contig, md5 in zip(contigs, md5s)
+                                  if md5 != assembly_contigs[contig]['md5']]
+        if unmatched_ids_md5s:
+            raise ValueError(warnings["assembly_ref_diff_seq"].format(", ".join(unmatched_ids_md5s)))
+
     def _find_input_files(self, input_directory):
         logging.info("Scanning for Genbank Format files.")
         valid_extensions = [".gbff", ".gbk", ".gb", ".genbank", ".dat", ".gbf"]
@@ -387,28 +615,26 @@ class GenbankToGenome:
 
         return input_files
 
-    def _join_files_skip_empty_lines(self, input_files):
-            """ Applies strip to each line of each input file.
+    def _original_file(self, input_files):
+            """ The single file holding the original uploaded bytes.
             Args:
                 input_files: Paths to input files in Genbank format.
             Returns:
-                Path to resulting file (currenly it's the same file as input).
+                Path to the input file itself, or to a byte for byte
+                concatenation when several files were staged.
             """
             if len(input_files) == 0:
                 raise ValueError("NO GENBANK FILE")
+            if len(input_files) == 1:
+                return input_files[0]
             temp_dir = os.path.join(os.path.dirname(input_files[0]), "combined")
             if not os.path.exists(temp_dir):
                 os.makedirs(temp_dir)
             ret_file = os.path.join(temp_dir, os.path.basename(input_files[0]))
-
-            # take in Genbank file and remove all empty lines from it.
-            with open(ret_file, 'w', buffering=2 ** 20) as f_out:
+            with open(ret_file, 'wb') as f_out:
                 for input_file in input_files:
-                    with open(input_file, 'r') as f_in:
-                        for line in f_in:
-                            line = line.rstrip('\r\n')
-                            if line.strip():
-                                f_out.write(line + '\n')
+                    with open(input_file, 'rb') as f_in:
+                        shutil.copyfileobj(f_in, f_out, 2 ** 20)
             return ret_file
 
     def _get_pubs(self, r_annotations):
@@ -440,48 +666,49 @@ class GenbankToGenome:
         logging.info(f"Parsed {len(pub_list)} publication records")
         return set(pub_list)
 
-    def _get_id(self, feat, tags=None):
+    def _get_id(self, feature):
         """Assign a id to a feature based on the first tag that exists"""
-        _id = ""
-        if not tags:
-            tags = ['locus_tag', 'kbase_id']
-        for t in tags:
-            _id = feat.qualifiers.get(t, [""])[0]
-            if _id:
-                break
+        _id = feature['tag_id']
+        feat_type = feature['type']
 
         if not _id:
-            if feat.type == 'gene':
+            if feat_type == 'gene':
                 if not self.generate_ids:
                     raise ValueError(f"Unable to find a valid id for gene "
-                                     f"among these tags: {', '.join(tags)}. Correct the "
-                                     f"file or rerun with generate_ids\n {feat}")
+                                     f"among these tags: {', '.join(feature['tags'])}. Correct "
+                                     f"the file or rerun with generate_ids\n "
+                                     f"{feature['description']}")
                 self.orphan_types['gene'] += 1
                 _id = f"gene_{self.orphan_types['gene']}"
-            if 'rna' in feat.type.lower() or feat.type in {'CDS', 'sig_peptide',
+            if 'rna' in feat_type.lower() or feat_type in {'CDS', 'sig_peptide',
                                                            'five_prime_UTR', 'three_prime_UTR'}:
                 _id = f"gene_{self.orphan_types['gene']}"
 
         return _id
 
-    def _parse_features(self, record, source):
-        def _location(feat):
-            """Convert to KBase style location objects"""
-            strand_trans = ("", "+", "-")
-            loc = []
-            for part in feat.location.parts:
-                contig_id = part.ref if part.ref else record.id
-                if part.strand >= 0:
-                    begin = int(part.start) + 1
-                else:
-                    begin = int(part.end)
-                loc.append((
-                        contig_id,
-                        begin,
-                        strand_trans[part.strand],
-                        len(part)))
-            return loc
-
+    def _parse_features(self, record, source, executor=None, pending=None):
+        """Parse the features of a record, in a worker process if an executor
+        is supplied. Worker results are merged in the order records were
+        submitted, so the genome is identical to a serial parse"""
+        args = (self.code_table, source, self.excluded_features, record.id, len(record),
+                record.features)
+        if executor is None:
+            self._merge_features(record.id, *_extract_record_features(self.contig_seq, *args))
+            return
+
+        contigs = self._referenced_contigs(record) | {record.id}
+        pending.append((record.id, executor.submit(
+            _extract_record_features, self.contig_seq.subset(contigs), *args)))
+        while len(pending) > self.parallel_workers * MAX_PENDING_RECORDS_PER_WORKER:
+            self._merge_pending(pending)
+
+    def _merge_pending(self, pending):
+        """Merge the oldest submitted record's features into the genome"""
+        record_id, future = pending.popleft()
+        self._merge_features(record_id, *future.result())
+
+    def _merge_features(self, record_id, skipped, parsed):
+        """Assign ids, parents and ontology events to extracted features"""
         def _warn(message):
             if message not in out_feat.get('warnings', []):
                 out_feat['warnings'] = out_feat.get('warnings', []) + [message]
@@ -490,13 +717,10 @@ class GenbankToGenome:
             if 'trans_splicing' in out_feat.get('flags', []):
                 return
 
-            if out_feat['location'] == sorted(out_feat['location'],
-                    reverse=(in_feature.location.strand == -1)):
+            if feature['in_order']:
                 return
 
-            if record.id in self.circ_contigs and \
-                    in_feature.location.start == 0 \
-                    and in_feature.location.end == len(record):
+            if record_id in self.circ_contigs and feature['spans_record']:
                 self.features_spaning_zero.add(out_feat['id'])
                 return
 
@@ -506,72 +730,44 @@ class GenbankToGenome:
             _warn(warnings['not_trans_spliced'])
             self.defects['not_trans_spliced'] += 1
 
-        for in_feature in record.features:
-            if in_feature.type in self.excluded_features:
-                self.skiped_features[in_feature.type] += 1
-                continue
-            feat_seq = self._get_seq(in_feature, record.id)
-            if source == "Ensembl":
-                _id = self._get_id(in_feature, ['gene', 'locus_tag'])
-            else:
-                _id = self._get_id(in_feature)
+        self.skiped_features.update(skipped)
+        for feature in parsed:
+            feat_type = feature['type']
+            _id = self._get_id(feature)
 
             # The following is common to all the feature types
-            out_feat = {
-                "id": "_".join([_id, in_feature.type]),
-                "location": _location(in_feature),
-                "dna_sequence": str(feat_seq),
-                "dna_sequence_length": len(feat_seq),
-                "md5": hashlib.md5(str(feat_seq).encode('utf8')).hexdigest(),
-            }
+            out_feat = {"id": "_".join([_id, feat_type])}
+            out_feat.update(feature['out_feat'])
             if not _id:
-                out_feat['id'] = in_feature.type
+                out_feat['id'] = feat_type
 
             # validate input feature
-            # note that end is the larger number regardless of strand
-            if int(in_feature.location.end) > len(record):
+            if feature['off_end']:
                 self.genome_warnings.append(
                     warnings["coordinates_off_end"].format(out_feat['id']))
                 self.genome_suspect = 1
                 continue
 
-            for piece in in_feature.location.parts:
-                if not isinstance(piece.start, ExactPosition) \
-                        or not isinstance(piece.end, ExactPosition):
-                    _warn(warnings["non_exact_coordinates"])
-
-            self.feature_counts[in_feature.type] += 1
+            self.feature_counts[feat_type] += 1
 
-            # add optional fields
-            if 'note' in in_feature.qualifiers:
-                out_feat['note'] = in_feature.qualifiers["note"][0]
-
-            out_feat.update(self._get_aliases_flags_functions(in_feature))
-
-            ont, db_xrefs = self._get_ontology_db_xrefs(in_feature)
+            ont = self._get_ontology_terms(feature['ontology_terms'])
             if ont:
                 out_feat['ontology_terms'] = ont
-            if db_xrefs:
-                out_feat['db_xrefs'] = db_xrefs
-
-            if 'inference' in in_feature.qualifiers:
-                out_feat['inference_data'] = parse_inferences(
-                    in_feature.qualifiers['inference'])
 
             _check_suspect_location(self.genes.get(_id))
 
             # add type specific features
-            if in_feature.type == 'CDS':
-                self.process_cds(_id, feat_seq, in_feature, out_feat)
+            if feat_type == 'CDS':
+                self.process_cds(_id, feature, out_feat)
 
-            elif in_feature.type == 'gene':
+            elif feat_type == 'gene':
                 self.process_gene(_id, out_feat)
 
-            elif in_feature.type == 'mRNA':
+            elif feat_type == 'mRNA':
                 self.process_mrna(_id, out_feat)
 
             else:
-                self.noncoding.append(self.process_noncoding(_id, in_feature.type, out_feat))
+                self.noncoding.append(self.process_noncoding(_id, feat_type, out_feat))
 
     def get_feature_lists(self):
         """sort genes into their final arrays"""
@@ -600,33 +796,14 @@ class GenbankToGenome:
         return {'features': coding, 'non_coding_features': self.noncoding,
                 'cdss': list(self.cdss.values()), 'mrnas': list(self.mrnas.values())}
 
-    def _get_seq(self, feat, contig):
-        """Extract the DNA sequence for a feature"""
-        seq = []
-        for part in feat.location.parts:
-            strand = part.strand
-            # handle trans-splicing across contigs
-            if part.ref:
-                part_contig = part.ref
-            else:
-                part_contig = contig
-
-            if strand >= 0:
-                seq.append(str(self.contig_seq[part_contig]
-                               [part.start:part.end]))
-            else:
-                seq.append(str(self.contig_seq[part_contig]
-                               [part.start:part.end].reverse_complement()))
-        return "".join(seq)
-
     def _create_ontology_event(self, ontology_type):
         """Creates the ontology_event if necessary
         Returns the index of the ontology event back."""
         if ontology_type not in self.ont_mappings:
             raise ValueError(f"{ontology_type} is not a supported ontology")
 
-        if "event_index" not in self.ont_mappings[ontology_type]:
-            self.ont_mappings[ontology_type]['event_index'] = len(self.ontology_events)
+        if ontology_type not in self.ontology_event_index:
+            self.ontology_event_index[ontology_type] = len(self.ontology_events)
             if ontology_type == "GO":
                 ontology_ref = "KBaseOntology/gene_ontology"
             elif ontology_type == "PO":
@@ -641,42 +818,21 @@ class GenbankToGenome:
                 "ontology_ref": ontology_ref
             })
 
-        return self.ont_mappings[ontology_type]['event_index']
+        return self.ontology_event_index[ontology_type]
 
-    def _get_ontology_db_xrefs(self, feature):
-        """Splits the ontology info from the other db_xrefs"""
+    def _get_ontology_terms(self, terms):
+        """Creates the ontology events for a feature's (ontology, term) pairs
+        and returns its ontology_terms"""
         ontology = defaultdict(dict)
-        db_xrefs = []
-        for key in ("GO_process", "GO_function", "GO_component"):
-            ontology_event_index = self._create_ontology_event("GO")
-            for term in feature.qualifiers.get(key, []):
-                sp = term.split(" - ")
-                ontology['GO'][sp[0]] = [ontology_event_index]
-                self.ontologies_present['GO'][sp[0]] = self.ont_mappings['GO'].get(sp[0], '')
-
-        for ref in feature.qualifiers.get('db_xref', []):
-            if ref.startswith('GO:'):
-                ontology['GO'][ref] = [self._create_ontology_event("GO")]
-                self.ontologies_present['GO'][ref] = self.ont_mappings['GO'].get(ref, '')
-            elif ref.startswith('PO:'):
-                ontology['PO'][ref] = [self._create_ontology_event("PO")]
-                self.ontologies_present['PO'][ref] = self.ont_mappings['PO'].get(ref, '')
-            elif ref.startswith('KO:'):
-                ontology['KO'][ref] = [self._create_ontology_event("KO")]
-                self.ontologies_present['KO'][ref] = self.ont_mappings['KO'].get(ref, '')
-            elif ref.startswith('COG'):
-                ontology['COG'][ref] = [self._create_ontology_event("COG")]
-                self.ontologies_present['COG'][ref] = self.ont_mappings['COG'].get(ref, '')
-            elif ref.startswith('PF'):
-                ontology['PFAM'][ref] = [self._create_ontology_event("PFAM")]
-                self.ontologies_present['PFAM'][ref] = self.ont_mappings['PFAM'].get(ref, '')
-            elif ref.startswith('TIGR'):
-                ontology['TIGRFAM'][ref] = [self._create_ontology_event("TIGRFAM")]
-                self.ontologies_present['TIGRFAM'][ref] = self.ont_mappings['TIGRFAM'].get(ref, '')
-            else:
-                db_xrefs.append(tuple(ref.split(":", 1)))
+        event_index = {"GO": self._create_ontology_event("GO")}
+        for ontology_type, term in terms:
+            if ontology_type not in event_index:
+                event_index[ontology_type] = self._create_ontology_event(ontology_type)
+            ontology[ontology_type][term] = [event_index[ontology_type]]
+            self.ontologies_present[ontology_type][term] = \
+                self.ont_mappings[ontology_type].get(term, '')
 
-        return dict(ontology), sorted(db_xrefs)
+        return dict(ontology)
 
     @staticmethod
     def _get_aliases_flags_functions(feat):
@@ -699,20 +855,15 @@ class GenbankToGenome:
 
     def _find_parent_gene(self, potential_id, feature):
         """Unfortunately, Genbank files don't have a parent ID and the features can be out of
-        order at times. To account for this, the this function works backwards from the end of
-        list of IDs and stops when if finds a parent with valid coordinates or it hits the maximum
-        number of tries"""
+        order at times. To account for this, the gene named by the feature is checked first and
+        then the positional gene index is searched for the most recently added gene with valid
+        coordinates"""
         if potential_id in self.genes:
-            lookup_attempts = 0
-            while lookup_attempts < MAX_PARENT_LOOKUPS:
-                if is_parent(self.genes[potential_id], feature):
-                    return potential_id
-
-                lookup_attempts += 1
-                try:
-                    potential_id = list(self.genes.keys())[-(lookup_attempts + 1)]
-                except IndexError:
-                    break  # no more genes that could match exist
+            if is_parent(self.genes[potential_id], feature):
+                return potential_id
+            for gene in self.gene_index.find_parents(feature):
+                if gene['id'] != potential_id:
+                    return gene['id']
 
             self.defects['bad_parent_loc'] += 1
         return None
@@ -727,6 +878,7 @@ class GenbankToGenome:
         if _id in self.genes:
             raise ValueError(f"Duplicate gene ID: {_id}")
         self.genes[_id] = out_feat
+        self.gene_index.add(out_feat)
 
     def process_noncoding(self, gene_id, feat_type, out_feat):
         out_feat["type"] = feat_type
@@ -765,7 +917,7 @@ class GenbankToGenome:
 
         self.mrnas[out_feat['id']] = out_feat
 
-    def process_cds(self, gene_id, feat_seq, in_feature, out_feat):
+    def process_cds(self, gene_id, feature, out_feat):
         # Associate CDS with parents
         cds_warnings = out_feat.get('warnings', [])
         validated_gene_id = self._find_parent_gene(gene_id, out_feat)
@@ -804,34 +956,32 @@ class GenbankToGenome:
                 self.mrnas[mrna_id]['cds'] = out_feat['id']
 
         # process protein
-        prot_seq = in_feature.qualifiers.get("translation", [""])[0]
+        prot_seq = feature['prot_seq']
+        feat_len = out_feat['dna_sequence_length']
 
         # allow a little slack to account for frameshift and stop codon
-        if prot_seq and abs(len(prot_seq) * 3 - len(feat_seq)) > 4:
-            cds_warnings.append(warnings["inconsistent_CDS_length"].format(len(feat_seq),
+        if prot_seq and abs(len(prot_seq) * 3 - feat_len) > 4:
+            cds_warnings.append(warnings["inconsistent_CDS_length"].format(feat_len,
                                                                            len(prot_seq)))
             self.genome_warnings.append(
                 warnings['genome_inc_CDS_length'].format(
-                    out_feat['id'], len(feat_seq), len(prot_seq)))
+                    out_feat['id'], feat_len, len(prot_seq)))
             self.genome_suspect = 1
 
-        try:
-            if prot_seq and prot_seq != Seq.translate(
-                    feat_seq, self.code_table, cds=True).strip("*"):
+        if 'translation_error' in feature:
+            if prot_seq:
+                cds_warnings.append("Unable to verify protein sequence:" +
+                                    feature['translation_error'])
+            else:
+                cds_warnings.append(warnings["no_translation_supplied"] +
+                                    feature['translation_error'])
+        elif prot_seq:
+            if prot_seq != feature['translation']:
                 cds_warnings.append(warnings["inconsistent_translation"])
                 self.defects['cds_seq_not_matching'] += 1
-
-        except TranslationError as e:
-            cds_warnings.append("Unable to verify protein sequence:" + str(e))
-
-        if not prot_seq:
-            try:
-                prot_seq = Seq.translate(
-                        feat_seq, self.code_table, cds=True).strip("*")
-                cds_warnings.append(warnings["no_translation_supplied"])
-
-            except TranslationError as e:
-                cds_warnings.append(warnings["no_translation_supplied"] + str(e))
+        else:
+            prot_seq = feature['translation']
+            cds_warnings.append(warnings["no_translation_supplied"])
 
         out_feat.update({
             "protein_translation": prot_seq,
@@ -3,12 +3,17 @@ import json
 import logging
 import os
 import re
-import sys
 from collections import defaultdict, namedtuple
 
 import requests
 
 from GenomeFileUtil.authclient import KBaseAuth as _KBaseAuth
+from GenomeFileUtil.core.GenomeJSON import SEPARATORS, write_genome_json
+from GenomeFileUtil.core.GenomeSize import FEATURE_LISTS, GenomeSize
+from GenomeFileUtil.core.GenomeUtils import OntologyEventIndex
+from GenomeFileUtil.core.PhaseTimer import PhaseTimer
+from GenomeFileUtil.core.TaxonCache import TaxonCache
+from GenomeFileUtil.core.TaxonomySnapshot import MAX_AGE_DAYS, open_taxonomy_snapshot
 from installed_clients.AbstractHandleClient import AbstractHandle as HandleService
 from installed_clients.AssemblySequenceAPIServiceClient import AssemblySequenceAPI
 from installed_clients.DataFileUtilClient import DataFileUtil
@@ -16,6 +21,10 @@ from installed_clients.KBaseSearchEngineClient import KBaseSearchEngine
 from installed_clients.WSLargeDataIOClient import WsLargeDataIO
 
 MAX_GENOME_SIZE = 2**30
+TAXON_CACHE_FILE = 'taxon_cache.sqlite'
+UNKNOWN_TAXON_REF = 'ReferenceTaxons/unknown_taxon'
+
+TaxonInfo = namedtuple('taxon_info', ['taxonomy', 'taxon_ref', 'domain', 'genetic_code'])
 
 
 class GenomeInterface:
@@ -33,6 +42,10 @@ class GenomeInterface:
         self.taxon_wsname = config.raw['taxon-workspace-name']
         self.scratch = config.raw['scratch']
         self.ws_large_data = WsLargeDataIO(self.callback_url)
+        self.taxon_cache = TaxonCache.shared(os.path.join(self.scratch, TAXON_CACHE_FILE))
+        self.taxonomy_snapshot = open_taxonomy_snapshot(
+            config.raw.get('taxonomy-snapshot'),
+            float(config.raw.get('taxonomy-snapshot-max-age-days', MAX_AGE_DAYS)))
 
     @staticmethod
     def _validate_save_one_genome_params(params):
@@ -133,7 +146,9 @@ class GenomeInterface:
         return data, res['info']
         #return self.dfu.get_objects(params)['data'][0]
 
-    def save_one_genome(self, params):
+    def save_one_genome(self, params, timer=None):
+        """Saves a genome object. The phases of the save are recorded by the
+        importer's PhaseTimer when one is passed"""
         logging.info('start saving genome object')
 
         self._validate_save_one_genome_params(params)
@@ -141,23 +156,30 @@ class GenomeInterface:
         workspace = params['workspace']
         name = params['name']
         data = params['data']
+        if timer is None:
+            timer = PhaseTimer(PhaseTimer.log_path(self.scratch, name))
         if 'meta' in params and params['meta']:
             meta = params['meta']
         else:
             meta = {}
         if params.get('upgrade') or 'feature_counts' not in data:
-            data = self._update_genome(data)
+            with timer.phase('update_genome'):
+                data = self._update_genome(data)
+        feature_count = sum(len(data.get(key, [])) for key in
+                            ('features', 'mrnas', 'cdss', 'non_coding_features'))
 
         # check all handles point to shock nodes owned by calling user
         self._own_handle(data, 'genbank_handle_ref')
         self._own_handle(data, 'gff_handle_ref')
 
-        self._check_dna_sequence_in_features(data)
-        data['warnings'] = self.validate_genome(data)
+        with timer.phase('validate_genome', feature_count):
+            self._check_dna_sequence_in_features(data)
+            data['warnings'] = self.validate_genome(data, timer)
 
         # dump genome to scratch for upload
         data_path = os.path.join(self.scratch, name + ".json")
-        json.dump(data, open(data_path, 'w'))
+        with timer.phase('write_genome_json', feature_count):
+            write_genome_json(data, data_path)
 
         if 'hidden' in params and str(params['hidden']).lower() in (
         'yes', 'true', 't', '1'):
@@ -177,9 +199,10 @@ class GenomeInterface:
                                     'meta': meta,
                                     'hidden': hidden}]}
 
-        dfu_oi = self.ws_large_data.save_objects(save_params)[0]
+        with timer.phase('save_objects', feature_count):
+            dfu_oi = self.ws_large_data.save_objects(save_params)[0]
 
-        returnVal = {'info': dfu_oi, 'warnings': data['warnings']}
+        returnVal = {'info': dfu_oi, 'warnings': data['warnings'], 'timings': timer.timings}
 
         return returnVal
 
@@ -187,16 +210,46 @@ class GenomeInterface:
         """
         _retrieve_taxon: retrieve taxonomy and taxon_reference
 
+        Taxa are resolved against the taxonomy snapshot when there is one for
+        taxon_wsname. Other lookups are cached, including those that find no
+        taxon
         """
-        taxon_info = namedtuple('taxon_info', ['taxonomy', 'taxon_ref', 'domain', 'genetic_code'])
-        default = taxon_info('Unconfirmed Organism: ' + scientific_name,
-                             'ReferenceTaxons/unknown_taxon', 'Unknown', 11)
+        taxon = self._snapshot_taxon(taxon_wsname, scientific_name, tax_id)
+        if taxon is not None:
+            return taxon
+        key = (taxon_wsname, '' if tax_id else scientific_name, str(tax_id or ''))
+        cached = self.taxon_cache.get(key)
+        if cached is None:
+            taxon = self._search_taxon(taxon_wsname, scientific_name, tax_id)
+            self.taxon_cache.put(key, taxon, taxon.taxon_ref != UNKNOWN_TAXON_REF)
+        else:
+            taxon = TaxonInfo(*cached)
+        logging.info(f"Taxon cache: {self.taxon_cache.stats()}")
+        return taxon
+
+    def _snapshot_taxon(self, taxon_wsname, scientific_name, tax_id=None):
+        snapshot = self.taxonomy_snapshot
+        if snapshot is None or snapshot.workspace != taxon_wsname:
+            return None
+        if tax_id:
+            found = snapshot.find_tax_id(tax_id)
+            if found is None:
+                return None
+            return TaxonInfo(found[1], f'{taxon_wsname}/{tax_id}_taxon', found[2], found[3])
+        found = snapshot.find_name(scientific_name)
+        if found is None:
+            return None
+        return TaxonInfo(found[1], taxon_wsname + "/" + found[0], found[2], found[3])
+
+    def _search_taxon(self, taxon_wsname, scientific_name, tax_id=None):
+        default = TaxonInfo('Unconfirmed Organism: ' + scientific_name,
+                            UNKNOWN_TAXON_REF, 'Unknown', 11)
 
         def extract_values(search_obj):
-            return taxon_info(search_obj['data']['scientific_lineage'],
-                              taxon_wsname+"/"+search_obj['object_name'],
-                              search_obj['data']['domain'],
-                              search_obj['data'].get('genetic_code', 11))
+            return TaxonInfo(search_obj['data']['scientific_lineage'],
+                             taxon_wsname+"/"+search_obj['object_name'],
+                             search_obj['data']['domain'],
+                             search_obj['data'].get('genetic_code', 11))
 
         if tax_id:
             ref = f'{taxon_wsname}/{tax_id}_taxon'
@@ -205,8 +258,8 @@ class GenomeInterface:
             except:
                 raise ValueError(f'{tax_id} is not a valid KBase taxon ID. Please specify a '
                                  f'different taxon or only a scientific name')
-            return taxon_info(tax_data['scientific_lineage'], ref,
-                              tax_data['domain'], tax_data['genetic_code'])
+            return TaxonInfo(tax_data['scientific_lineage'], ref,
+                             tax_data['domain'], tax_data['genetic_code'])
 
         search_params = {
             "object_types": ["taxon"],
@@ -272,6 +325,7 @@ class GenomeInterface:
         ontologies_present = defaultdict(dict)
         ontologies_present.update(genome.get('ontologies_present', {}))
         ontology_events = genome.get('ontology_events', [])
+        event_index = OntologyEventIndex(ontology_events)
         if 'genome_tier' not in genome:
             genome['source'], genome['genome_tiers'] = self.determine_tier(
                 genome['source'])
@@ -348,9 +402,7 @@ class GenomeInterface:
                         for ev in term['evidence']:
                             ev['id'] = ontology
                             ev['ontology_ref'] = term["ontology_ref"]
-                            if ev not in ontology_events:
-                                ontology_events.append(ev)
-                            term_evidence.append(ontology_events.index(ev))
+                            term_evidence.append(event_index.index(ev))
                         feat['ontology_terms'][ontology][term['id']] = term_evidence
 
                 # remove deprecated fields
@@ -404,7 +456,7 @@ class GenomeInterface:
         return genome
 
     @staticmethod
-    def validate_genome(g):
+    def validate_genome(g, timer=None):
         """
         Run a series of checks on the genome object and return any warnings
         """
@@ -437,16 +489,15 @@ class GenomeInterface:
         if g['taxon_ref'] == "ReferenceTaxons/unknown_taxon":
             warnings.append('Unable to determine organism taxonomy')
 
-        GenomeInterface.handle_large_genomes(g)
+        with (timer or PhaseTimer()).phase('handle_large_genomes'):
+            GenomeInterface.handle_large_genomes(g)
         return warnings
 
     @staticmethod
     def handle_large_genomes(g):
         """Determines the size of various feature arrays and starts removing the dna_sequence if
-        the genome is getting too big to store in the workspace"""
-        def _get_size(obj):
-            return sys.getsizeof(json.dumps(obj))
-
+        the genome is getting too big to store in the workspace. The genome is measured once
+        and the sizes are updated as sequences are removed"""
         def sizeof_fmt(num):
             for unit in ['', 'Ki', 'Mi', 'Gi', 'Ti', 'Pi', 'Ei', 'Zi']:
                 if abs(num) < 1024.0:
@@ -454,32 +505,18 @@ class GenomeInterface:
                 num /= 1024.0
             return "%.1f %sB" % (num, 'Yi')
 
-        feature_lists = ('mrnas', 'features', 'non_coding_features', 'cdss')
-        master_key_sizes = dict()
+        sizes = GenomeSize(g, SEPARATORS)
         # Change want full breakdown to True if want to see break down of sizes.
-        # By making this a changeable flag it will run faster for standard uploads.
         want_full_breakdown = False
-        for x in feature_lists:
+        for x in FEATURE_LISTS:
             if x in g:
-                need_to_remove_dna_sequence = _get_size(g) > MAX_GENOME_SIZE
-                if need_to_remove_dna_sequence or want_full_breakdown:
-                    feature_type_dict_keys = dict()
-                    for feature in g[x]:
-                        for feature_key in list(feature.keys()):
-                            if feature_key == "dna_sequence" and need_to_remove_dna_sequence:
-                                del (feature["dna_sequence"])
-                            else:
-                                if feature_key not in feature_type_dict_keys:
-                                    feature_type_dict_keys[feature_key] = 0
-                                feature_type_dict_keys[feature_key] += sys.getsizeof(
-                                    feature[feature_key])
-                    for feature_key in feature_type_dict_keys:
-                        feature_type_dict_keys[feature_key] = sizeof_fmt(
-                            feature_type_dict_keys[feature_key])
-                    master_key_sizes[x] = feature_type_dict_keys
-                print(f"{x}: {sizeof_fmt(_get_size(g[x]))}")
-        total_size = _get_size(g)
+                if sizes.total > MAX_GENOME_SIZE:
+                    sizes.drop_sequences(x)
+                print(f"{x}: {sizeof_fmt(sizes.lists[x])}")
+        total_size = sizes.total
         print(f"Total size {sizeof_fmt(total_size)} ")
+        master_key_sizes = {x: {field: sizeof_fmt(size) for field, size in fields.items()}
+                            for x, fields in sizes.fields.items()}
         if want_full_breakdown:
             print(f"Here is the breakdown of the sizes of feature lists elements : "
                   f"{str(master_key_sizes)}")
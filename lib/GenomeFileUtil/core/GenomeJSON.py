@@ -0,0 +1,42 @@
+"""
+Streaming JSON output of genome objects.
+"""
+import json
+
+from GenomeFileUtil.core.GenomeSize import FEATURE_LISTS
+
+# compact output, which GenomeSize measures when given the same separators
+SEPARATORS = (',', ':')
+# features encoded per write
+CHUNK_SIZE = 1000
+BUFFER_SIZE = 2**22
+
+# the C encoder, which json.dump doesn't use as it writes piece by piece
+_encode = json.JSONEncoder(separators=SEPARATORS, check_circular=False).encode
+
+
+def _write_features(out, features):
+    out.write('[')
+    for start in range(0, len(features), CHUNK_SIZE):
+        if start:
+            out.write(',')
+        out.write(','.join(map(_encode, features[start:start + CHUNK_SIZE])))
+    out.write(']')
+
+
+def write_genome_json(genome, path):
+    """Write a genome to path as compact JSON.
+    The feature lists are encoded a chunk of features at a time, so the
+    encoded genome is never held in memory whole. The output is the same as
+    json.dump with SEPARATORS."""
+    with open(path, 'w', buffering=BUFFER_SIZE, encoding='ascii') as out:
+        out.write('{')
+        for i, (key, value) in enumerate(genome.items()):
+            if i:
+                out.write(',')
+            out.write(_encode(key) + ':')
+            if key in FEATURE_LISTS:
+                _write_features(out, value)
+            else:
+                out.write(_encode(value))
+        out.write('}')
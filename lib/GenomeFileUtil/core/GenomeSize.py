@@ -0,0 +1,83 @@
+"""
+Encoded size accounting for genome objects.
+"""
+import json
+from collections import defaultdict
+from json.encoder import encode_basestring_ascii
+
+# in the order their sequences are given up when a genome is too large
+FEATURE_LISTS = ('mrnas', 'features', 'non_coding_features', 'cdss')
+
+
+class GenomeSize:
+    """The size of a genome encoded as JSON with the given separators, of
+    each of its feature lists and of each field within a list, from a single
+    pass that encodes every value once. The sizes are exact for the ASCII
+    output of json.dump.
+
+    Sequences are dropped from a feature list with drop_sequences, which
+    updates the sizes without encoding anything again."""
+
+    def __init__(self, genome, separators=(', ', ': ')):
+        self.genome = genome
+        self._item_sep, self._key_sep = (len(sep) for sep in separators)
+        self._encode = json.JSONEncoder(separators=separators).encode
+        self._key_sizes = {}
+        # top level key -> size of its entry, for everything but feature lists
+        self._entries = {}
+        # feature list -> its size, and field -> size of the field's entries in it
+        self.lists = {}
+        self.fields = {}
+        # feature list -> separators that go with its dna_sequence fields
+        self._sequence_separators = {}
+        for key, value in genome.items():
+            if key in FEATURE_LISTS:
+                self._measure_list(key, value)
+            else:
+                self._entries[key] = self._entry(key, value)
+
+    def _key_size(self, key):
+        """Size of '"key": '"""
+        key_size = self._key_sizes.get(key)
+        if key_size is None:
+            key_size = self._key_sizes[key] = len(self._encode(key)) + self._key_sep
+        return key_size
+
+    def _entry(self, key, value):
+        """Size of '"key": value' in a JSON object"""
+        key_size = self._key_size(key)
+        if value.__class__ is str:
+            return key_size + len(encode_basestring_ascii(value))
+        return key_size + len(self._encode(value))
+
+    def _measure_list(self, key, features):
+        fields = defaultdict(int)
+        separators = sequence_separators = 0
+        for feature in features:
+            if len(feature) > 1:
+                separators += len(feature) - 1
+                sequence_separators += 'dna_sequence' in feature
+            for field, value in feature.items():
+                fields[field] += self._entry(field, value)
+        separators += max(len(features) - 1, 0)
+        self.fields[key] = dict(fields)
+        self._sequence_separators[key] = sequence_separators
+        # brackets and braces, entries and separators
+        self.lists[key] = 2 + 2 * len(features) + sum(fields.values()) + \
+            separators * self._item_sep
+
+    @property
+    def total(self):
+        entries = list(self._entries.values())
+        entries.extend(self._key_size(key) + size for key, size in self.lists.items())
+        return 2 + sum(entries) + max(len(entries) - 1, 0) * self._item_sep
+
+    def drop_sequences(self, key):
+        """Remove the dna_sequence of every feature in a feature list"""
+        for feature in self.genome[key]:
+            feature.pop('dna_sequence', None)
+        saved = self.fields[key].pop('dna_sequence', 0) + \
+            self._sequence_separators[key] * self._item_sep
+        self._sequence_separators[key] = 0
+        self.lists[key] -= saved
+        return saved
@@ -11,6 +11,7 @@ from Bio import SeqIO, SeqFeature, Alphabet
 from installed_clients.AssemblyUtilClient import AssemblyUtil
 from installed_clients.DataFileUtilClient import DataFileUtil
 from GenomeFileUtil.core.GenomeInterface import GenomeInterface
+from GenomeFileUtil.core.GenomeUtils import ContigIndex
 
 STD_PREFIX = " " * 21
 CONTIG_ID_FIELD_LENGTH = 16
@@ -127,9 +128,9 @@ class GenomeFile:
             else:
                 self.features_by_contig[cds['location'][0][0]].append(cds)
 
-        assembly_file_path, circ_contigs = self._get_assembly(genome_object)
+        assembly_file_path, contigs = self._get_assembly(genome_object)
         for contig in SeqIO.parse(open(assembly_file_path), 'fasta', Alphabet.generic_dna):
-            if contig.id in circ_contigs:
+            if contig.id in contigs and contigs.is_circular(contig.id):
                 contig.annotations['topology'] = "circular"
             self._parse_contig(contig)
 
@@ -145,17 +146,12 @@ class GenomeFile:
         assembly_data = dfu.get_objects({
             'object_refs': [f'{self.genome_ref};{assembly_ref}']
         })['data'][0]['data']
-        if isinstance(assembly_data['contigs'], dict):  # is an assembly
-            circular_contigs = set([x['contig_id'] for x in list(assembly_data['contigs'].values())
-                                    if x.get('is_circ')])
-        else:  # is a contig set
-            circular_contigs = set([x['id'] for x in assembly_data['contigs']
-                                    if x.get('replicon_geometry') == 'circular'])
+        contigs = ContigIndex.from_assembly(assembly_data)
         au = AssemblyUtil(self.cfg.callbackURL)
         assembly_file_path = au.get_assembly_as_fasta(
             {'ref': f'{self.genome_ref};{assembly_ref}'}
         )['path']
-        return assembly_file_path, circular_contigs
+        return assembly_file_path, contigs
 
     def _parse_contig(self, raw_contig):
         def feature_sort(feat):
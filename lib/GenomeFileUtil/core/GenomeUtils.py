@@ -1,7 +1,10 @@
-import json
+import hashlib
 import logging
-import os
-import re
+import random
+
+import numpy as np
+
+from GenomeFileUtil.core.OntologyIndex import OntologyMappings
 
 warnings = {
     "cds_excluded": "SUSPECT: CDS from {} was excluded because the associated "
@@ -148,6 +151,345 @@ def is_parent(feat1, feat2):
     return True
 
 
+# fields of a node in the interval tree of a ParentIndex
+_LOW, _ORDER, _HIGH, _MAX_HIGH, _PRIORITY, _LEFT, _RIGHT = range(7)
+
+
+def _update_max_high(node):
+    max_high = node[_HIGH]
+    for child in (node[_LEFT], node[_RIGHT]):
+        if child is not None and child[_MAX_HIGH] > max_high:
+            max_high = child[_MAX_HIGH]
+    node[_MAX_HIGH] = max_high
+
+
+def _insert_part(node, part):
+    """Insert part into the treap rooted at node, returning the new root"""
+    if node is None:
+        return part
+    side, other = (_LEFT, _RIGHT) if part[_LOW] < node[_LOW] else (_RIGHT, _LEFT)
+    child = node[side] = _insert_part(node[side], part)
+    if child[_PRIORITY] > node[_PRIORITY]:
+        node[side] = child[other]
+        child[other] = node
+        _update_max_high(node)
+        _update_max_high(child)
+        return child
+    if part[_HIGH] > node[_MAX_HIGH]:
+        node[_MAX_HIGH] = part[_HIGH]
+    return node
+
+
+class ParentIndex:
+    """Positional index of potential parent features.
+
+    Each location part of an added feature is kept in an interval tree for
+    its contig and strand: a treap ordered by start, where every node also
+    holds the highest end below it. Candidate parents for a child are the
+    features with a part containing the first part of the child. Subtrees
+    that end before the child are skipped, so a single long feature doesn't
+    slow down every lookup. Candidates are confirmed with is_parent."""
+
+    def __init__(self):
+        self._trees = {}
+        self._features = {}
+
+    @staticmethod
+    def _span(loc):
+        # matches the coordinate arithmetic of is_parent
+        if loc[2] == "+":
+            return loc[1], loc[1] + loc[3]
+        return loc[1] - loc[3], loc[1]
+
+    def __len__(self):
+        return len(self._features)
+
+    def add(self, feat):
+        order = len(self._features)
+        self._features[order] = feat
+        for loc in feat['location']:
+            key = (loc[0], loc[2])
+            low, high = self._span(loc)
+            part = [low, order, high, high, random.random(), None, None]
+            self._trees[key] = _insert_part(self._trees.get(key), part)
+
+    def find_parents(self, feat):
+        """Yield the features that are a valid parent of feat, most recently
+        added first"""
+        loc = feat['location'][0]
+        low, high = self._span(loc)
+        candidates = set()
+        nodes = [self._trees.get((loc[0], loc[2]))]
+        while nodes:
+            node = nodes.pop()
+            if node is None or node[_MAX_HIGH] < high:
+                continue
+            nodes.append(node[_LEFT])
+            if node[_LOW] <= low:
+                if node[_HIGH] >= high:
+                    candidates.add(node[_ORDER])
+                nodes.append(node[_RIGHT])
+        for order in sorted(candidates, reverse=True):
+            if is_parent(self._features[order], feat):
+                yield self._features[order]
+
+
+_containers = (dict, list)
+
+
+def _freeze(value):
+    """A hashable stand-in for a JSON value that is equal where it is"""
+    if isinstance(value, dict):
+        return frozenset([(key, _freeze(item) if isinstance(item, _containers) else item)
+                          for key, item in value.items()])
+    if isinstance(value, list):
+        return tuple([_freeze(item) if isinstance(item, _containers) else item
+                      for item in value])
+    return value
+
+
+class OntologyEventIndex:
+    """The ontology events of a genome with each event hashed to its
+    position, so finding one doesn't scan the list. Equal events share the
+    position of the first of them."""
+
+    def __init__(self, events):
+        self.events = events
+        self._positions = {}
+        for i, event in enumerate(events):
+            self._positions.setdefault(_freeze(event), i)
+
+    def __len__(self):
+        return len(self.events)
+
+    def index(self, event):
+        """The position of event, which is appended if it is new"""
+        key = _freeze(event)
+        i = self._positions.get(key)
+        if i is None:
+            i = self._positions[key] = len(self.events)
+            self.events.append(event)
+        return i
+
+
+class ContigIndex:
+    """Contig id -> (length, is_circ, ordinal) for a genome or assembly.
+
+    is_circ is 1 or 0 when the topology is known and None otherwise, and the
+    ordinal is the contig's position in the source."""
+
+    def __init__(self):
+        self._contigs = {}
+
+    @classmethod
+    def from_genome(cls, genome):
+        index = cls()
+        for contig_id, length in zip(genome.get('contig_ids', []),
+                                     genome.get('contig_lengths', [])):
+            index.add(contig_id, length)
+        return index
+
+    @classmethod
+    def from_assembly(cls, assembly):
+        """Index the contigs of an Assembly or a legacy ContigSet"""
+        index = cls()
+        if isinstance(assembly['contigs'], dict):  # is an assembly
+            for contig_id, contig in assembly['contigs'].items():
+                index.add(contig.get('contig_id', contig_id), contig.get('length'),
+                          contig.get('is_circ'))
+        else:  # is a contig set
+            for contig in assembly['contigs']:
+                geometry = contig.get('replicon_geometry')
+                index.add(contig['id'], contig.get('length'),
+                          None if geometry is None else int(geometry == 'circular'))
+        return index
+
+    def add(self, contig_id, length, is_circ=None):
+        self._contigs[contig_id] = (length, is_circ, len(self._contigs))
+
+    def __contains__(self, contig_id):
+        return contig_id in self._contigs
+
+    def __iter__(self):
+        return iter(self._contigs)
+
+    def __len__(self):
+        return len(self._contigs)
+
+    @property
+    def ids(self):
+        return list(self._contigs)
+
+    @property
+    def lengths(self):
+        return [contig[0] for contig in self._contigs.values()]
+
+    def length(self, contig_id):
+        return self._contigs[contig_id][0]
+
+    def is_circular(self, contig_id):
+        return bool(self._contigs[contig_id][1])
+
+    def ordinal(self, contig_id):
+        return self._contigs[contig_id][2]
+
+
+class LocationTable:
+    """The locations of many features held column-wise in numpy arrays:
+    contig ordinal, start, lowest and highest base and strand per location
+    part, with each feature's parts found through an offsets array.
+
+    The checks run over every feature at once and give one result per
+    feature, in the order of the locations the table was built from. Each
+    location is a list of one or more [contig, start, strand, length]
+    parts."""
+
+    _strands = {'+': 1, '-': -1}
+
+    def __init__(self, contigs, locations):
+        locations = list(locations)
+        parts = [loc for location in locations for loc in location]
+        counts = np.fromiter(map(len, locations), np.int64, len(locations))
+        self.offsets = np.zeros(len(locations) + 1, np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        # the feature each part belongs to
+        self.row = np.repeat(np.arange(len(locations)), counts)
+
+        ordinals = {contig_id: contigs.ordinal(contig_id)
+                    for contig_id in {loc[0] for loc in parts}}
+        self.lengths = np.array(contigs.lengths, np.int64)
+        self.contig = np.fromiter((ordinals[loc[0]] for loc in parts), np.int64, len(parts))
+        self.start = np.fromiter((loc[1] for loc in parts), np.int64, len(parts))
+        length = np.fromiter((loc[3] for loc in parts), np.int64, len(parts))
+        self.strand = np.fromiter((self._strands.get(loc[2], 0) for loc in parts),
+                                  np.int8, len(parts))
+        # the arithmetic of get_start and get_end
+        plus, minus = self.strand == 1, self.strand == -1
+        self.low = np.where(plus, self.start, np.where(minus, self.start - (length - 1), 0))
+        self.high = np.where(plus, self.start + (length - 1), np.where(minus, self.start, 0))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def _first(self):
+        return self.offsets[:-1]
+
+    def _any(self, part_mask):
+        """Whether any part of each feature is flagged in part_mask"""
+        return np.bincount(self.row[part_mask], minlength=len(self)) > 0
+
+    def part_counts(self):
+        return np.diff(self.offsets).tolist()
+
+    def _single_contig(self):
+        return ~self._any(self.contig != self.contig[self._first][self.row])
+
+    def single_contig(self):
+        return self._single_contig().tolist()
+
+    def mixed_strands(self):
+        return self._any(self.strand != self.strand[self._first][self.row]).tolist()
+
+    def out_of_order(self):
+        """Whether the starts of a feature's parts decrease in the direction
+        of its first part's strand"""
+        reverse = self.strand[self._first] == -1
+        step = np.diff(self.start)
+        backwards = np.where(reverse[self.row[1:]], step > 0, step < 0)
+        # only steps between parts of the same feature count
+        backwards &= self.row[1:] == self.row[:-1]
+        out_of_order = np.bincount(self.row[1:][backwards], minlength=len(self)) > 0
+        # the walk along the parts starts from 0
+        lead = np.where(reverse, self.start[self.offsets[1:] - 1], self.start[self._first])
+        return (out_of_order | (lead < 0)).tolist()
+
+    def spans_contig(self):
+        """Whether a feature on a single contig covers it from its first base
+        to its last"""
+        if not len(self):
+            return []
+        first = self._first
+        spans = (np.minimum.reduceat(self.low, first) == 1) & \
+            (np.maximum.reduceat(self.high, first) == self.lengths[self.contig[first]])
+        return (spans & self._single_contig()).tolist()
+
+
+class FragmentBuilder:
+    """Collects the sequence fragments of features whose ID repeats across
+    lines (multi part CDSs and trans-spliced genes) so the joined sequence,
+    its length and md5 are only computed once all parts are read"""
+
+    def __init__(self):
+        self._parts = {}
+
+    def __len__(self):
+        return len(self._parts)
+
+    def add(self, feature, location, sequence):
+        feature['location'].append(location)
+        parts = self._parts.get(feature['id'])
+        if parts is None:
+            parts = self._parts[feature['id']] = [feature.get('dna_sequence', '')]
+        parts.append(sequence)
+
+    def join(self, feature_dict):
+        """Write the joined sequences into the features of feature_dict"""
+        for feature_id, parts in self._parts.items():
+            feature = feature_dict[feature_id]
+            feature['dna_sequence'] = "".join(parts)
+            feature['dna_sequence_length'] = len(feature['dna_sequence'])
+            feature['md5'] = hashlib.md5(feature['dna_sequence'].encode('utf8')).hexdigest()
+        self._parts.clear()
+
+
+class SkipEmptyLinesReader:
+    """Read only text stream over the concatenation of several files with
+    the empty lines dropped, so a parser can read multiple staged input
+    files without first copying them into a combined file."""
+
+    def __init__(self, input_files, buffering=2 ** 20):
+        if not input_files:
+            raise ValueError("No input files to read")
+        self._lines = self._iter_lines(input_files, buffering)
+
+    @staticmethod
+    def _iter_lines(input_files, buffering):
+        for input_file in input_files:
+            with open(input_file, 'r', buffering=buffering) as f_in:
+                for line in f_in:
+                    line = line.rstrip('\r\n')
+                    if line.strip():
+                        yield line + '\n'
+
+    def __iter__(self):
+        return self._lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def readline(self):
+        return next(self._lines, '')
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return ''.join(self._lines)
+        chunk = []
+        while size > 0:
+            line = next(self._lines, '')
+            if not line:
+                break
+            chunk.append(line)
+            size -= len(line)
+        return ''.join(chunk)
+
+    def close(self):
+        self._lines.close()
+
+
 def parse_inferences(inferences):
     """Whoever designed the genbank delimitation is an idiot: starts and
     ends with a optional values and uses a delimiter ":" that is
@@ -195,45 +537,15 @@ def propagate_cds_props_to_gene(cds, gene):
 
 
 def load_ontology_mappings(path='data'):
-    mapping_dict = {}
-    for file in os.listdir(path):
-        m = re.match("(\w+)_ontology_mapping.json", file)
-        if m:
-            ont_dict = json.load(open(os.path.join(path, file)))
-            mapping_dict[m.group(1).upper()] = ont_dict
+    """Ontology name mappings keyed by ontology. Each one is opened on first
+    use, so this only scans the directory"""
+    mapping_dict = OntologyMappings(path)
     if not mapping_dict:
         raise ValueError(f'No valid ontology mappings were found at {path}')
-    logging.info(f'Loaded {len(mapping_dict)} ontologies')
+    logging.info(f'Found {len(mapping_dict)} ontologies')
     return mapping_dict
 
 
-def check_full_contig_length_or_multi_strand_feature(feature, is_transpliced, contig_length, skip_types):
-    """
-    Tests for full contig length features and if on both strands.
-    """
-    feature_min_location = None
-    feature_max_location = None
-    strand_set = set()
-    contig_id = feature["location"][0][0]
-    for location in feature["location"]:
-        if location[0] != contig_id:
-            return feature
-        location_min = get_start(location)
-        location_max = get_end(location)
-        strand_set.add(location[2])                 
-        if feature_min_location is None or feature_min_location > location_min:
-            feature_min_location = location_min
-        if feature_max_location is None or feature_max_location < location_max:
-            feature_max_location = location_max
-    if feature_min_location == 1 \
-        and feature_max_location == contig_length \
-        and feature['type'] not in skip_types: 
-        feature["warnings"] = feature.get('warnings', []) + [warnings["contig_length_feature"]]  
-    if len(strand_set) > 1 and not is_transpliced:
-        feature["warnings"] = feature.get('warnings', []) + [warnings["both_strand_coordinates"]]
-    return feature 
-
-
 def check_feature_ids_uniqueness(genome):
     """
     Tests that all feature ids in a genome are unique across all 4 feature type lists
@@ -0,0 +1,52 @@
+"""
+Splits ontology terms from the other db_xrefs of a feature. Shared by the
+GenBank and GFF importers.
+"""
+from collections import defaultdict
+
+# db_xref prefix -> ontology the reference is a term of. Supporting a new
+# ontology only needs an entry here and a mapping file in data/
+ONTOLOGY_PREFIXES = {
+    'GO:': 'GO',
+    'PO:': 'PO',
+    'KO:': 'KO',
+    'COG': 'COG',
+    'PF': 'PFAM',
+    'TIGR': 'TIGRFAM',
+}
+
+# first character -> (prefix, ontology) pairs to try, longest prefix first
+_dispatch = defaultdict(list)
+for _prefix, _ontology in sorted(ONTOLOGY_PREFIXES.items(), key=lambda x: -len(x[0])):
+    _dispatch[_prefix[0]].append((_prefix, _ontology))
+_dispatch = dict(_dispatch)
+
+
+def classify_db_xref(ref):
+    """The ontology a db_xref is a term of, or None for a plain db_xref"""
+    for prefix, ontology in _dispatch.get(ref[:1], ()):
+        if ref.startswith(prefix):
+            return ontology
+    return None
+
+
+def split_db_xrefs(refs):
+    """Split a feature's references into a list of (ontology, term) pairs and
+    a list of (db, id) db_xrefs, both in the order they were given"""
+    terms = []
+    db_xrefs = []
+    dispatch = _dispatch
+    for ref in refs:
+        for prefix, ontology in dispatch.get(ref[:1], ()):
+            if ref.startswith(prefix):
+                terms.append((ontology, ref))
+                break
+        else:
+            db_xrefs.append(tuple(ref.split(":", 1)))
+    return terms, db_xrefs
+
+
+def go_terms(annotations):
+    """(ontology, term) pairs for GO annotations formatted as
+    "GO:0000001 - term name", as in GO_process qualifiers"""
+    return [('GO', annotation.split(" - ")[0]) for annotation in annotations]
@@ -0,0 +1,146 @@
+"""
+Compiled ontology term to name mappings that are looked up through mmap.
+"""
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+
+# file layout: magic, term count n, n + 1 term offsets, n + 1 name offsets,
+# then the utf-8 terms in sorted order followed by their names
+MAGIC = b"KBONTIDX"
+HEADER = struct.Struct("<8sI")
+OFFSET = struct.Struct("<I")
+mapping_re = re.compile(r"(\w+)_ontology_mapping\.(json|idx)$")
+
+
+def write_ontology_index(mapping, index_file):
+    """Compile a term to name dict into an index file"""
+    items = sorted((term.encode('utf8'), name.encode('utf8'))
+                   for term, name in mapping.items())
+    blob = bytearray()
+    term_offsets, name_offsets = [], []
+    for term, _ in items:
+        term_offsets.append(len(blob))
+        blob += term
+    term_offsets.append(len(blob))
+    for _, name in items:
+        name_offsets.append(len(blob))
+        blob += name
+    name_offsets.append(len(blob))
+    with open(index_file, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, len(items)))
+        out.write(struct.pack(f"<{len(term_offsets)}I", *term_offsets))
+        out.write(struct.pack(f"<{len(name_offsets)}I", *name_offsets))
+        out.write(blob)
+
+
+class OntologyIndex:
+    """Read only term to name lookups over an index file made by
+    write_ontology_index. Terms are found by binary search of the mapped
+    file so nothing but the header is read up front."""
+
+    def __init__(self, index_file):
+        self.path = index_file
+        with open(index_file, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{index_file} is not an ontology index")
+        self._term_offsets = HEADER.size
+        self._name_offsets = self._term_offsets + OFFSET.size * (self._count + 1)
+        self._blob = self._name_offsets + OFFSET.size * (self._count + 1)
+        # the same few terms recur on many features
+        self._cache = {}
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, term):
+        return self._find(term) is not None
+
+    def __getitem__(self, term):
+        name = self.get(term)
+        if name is None:
+            raise KeyError(term)
+        return name
+
+    def _offsets(self, table, i):
+        start = OFFSET.unpack_from(self._mmap, table + OFFSET.size * i)[0]
+        end = OFFSET.unpack_from(self._mmap, table + OFFSET.size * (i + 1))[0]
+        return self._blob + start, self._blob + end
+
+    def _find(self, term):
+        key = term.encode('utf8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, end = self._offsets(self._term_offsets, mid)
+            probe = self._mmap[start:end]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def get(self, term, default=None):
+        if term in self._cache:
+            return self._cache[term]
+        i = self._find(term)
+        if i is None:
+            return default
+        start, end = self._offsets(self._name_offsets, i)
+        name = self._cache[term] = self._mmap[start:end].decode('utf8')
+        return name
+
+
+class JsonOntology(dict):
+    """Fallback for a mapping that has not been compiled to an index"""
+
+    def __init__(self, json_file):
+        with open(json_file) as f:
+            super().__init__(json.load(f))
+
+
+# indexes are read only, so every importer in the process shares them
+_open_ontologies = {}
+
+
+class OntologyMappings:
+    """The ontologies available in a data directory, keyed by upper case
+    name. An ontology is only opened when it is first used, from its
+    compiled .idx file if there is one and its JSON mapping otherwise."""
+
+    def __init__(self, path):
+        self._files = {}
+        for file in sorted(os.listdir(path)):
+            m = mapping_re.match(file)
+            if not m:
+                continue
+            ontology = m.group(1).upper()
+            # prefer the compiled index when both exist
+            if m.group(2) == 'idx' or ontology not in self._files:
+                self._files[ontology] = os.path.join(path, file)
+
+    def __contains__(self, ontology):
+        return ontology in self._files
+
+    def __len__(self):
+        return len(self._files)
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __getitem__(self, ontology):
+        file = self._files[ontology]
+        if file not in _open_ontologies:
+            logging.info(f'Opening {ontology} ontology mapping {file}')
+            if file.endswith('.idx'):
+                _open_ontologies[file] = OntologyIndex(file)
+            else:
+                _open_ontologies[file] = JsonOntology(file)
+        return _open_ontologies[file]
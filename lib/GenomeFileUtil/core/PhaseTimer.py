@@ -0,0 +1,87 @@
+"""
+Per phase resource accounting for the genome importers.
+"""
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _io_counters():
+    """Bytes read and written by the calling thread so far, from /proc when
+    the platform has it"""
+    try:
+        with open('/proc/thread-self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _cpu_time():
+    """CPU time of the calling thread, and in the main thread that of the
+    worker processes it has reaped, which only the main thread starts"""
+    cpu = time.thread_time()
+    if threading.current_thread() is threading.main_thread():
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu += children.ru_utime + children.ru_stime
+    return cpu
+
+
+class PhaseTimer:
+    """Records wall time, CPU time, peak RSS, bytes read and written and
+    features per second for the named phases of an import.
+
+    Phases may nest, in which case the outer phase includes the inner one,
+    and may run in other threads, such as uploads that overlap parsing. CPU
+    time and bytes read and written are those of the thread running the
+    phase, so overlapping phases aren't charged for each other. Peak RSS is
+    the high water mark of the whole process when the phase ends. Each
+    finished phase is appended as a JSON line to log_file if one is given."""
+
+    def __init__(self, log_file=None):
+        self.log_file = log_file
+        self.timings = []
+
+    @contextmanager
+    def phase(self, name, features=None):
+        """Time the enclosed block. The yielded dict may be given a
+        'features' count when it is only known at the end of the phase"""
+        record = {'phase': name}
+        if features is not None:
+            record['features'] = features
+        wall, cpu = time.perf_counter(), _cpu_time()
+        read, written = _io_counters()
+        try:
+            yield record
+        finally:
+            record['wall_time'] = round(time.perf_counter() - wall, 6)
+            record['cpu_time'] = round(_cpu_time() - cpu, 6)
+            # ru_maxrss is in KiB on Linux, and is never reset
+            record['peak_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+            end_read, end_written = _io_counters()
+            if read is not None and end_read is not None:
+                record['bytes_read'] = end_read - read
+                record['bytes_written'] = end_written - written
+            if record.get('features') and record['wall_time']:
+                record['features_per_second'] = round(
+                    record['features'] / record['wall_time'], 2)
+            self._finish(record)
+
+    def _finish(self, record):
+        self.timings.append(record)
+        logging.info(f"Phase {record['phase']} took {record['wall_time']}s wall, "
+                     f"{record['cpu_time']}s CPU")
+        if self.log_file:
+            try:
+                with open(self.log_file, 'a') as f:
+                    f.write(json.dumps(record) + '\n')
+            except OSError as e:
+                logging.warning(f"Unable to write timings to {self.log_file}: {e}")
+
+    @staticmethod
+    def log_path(directory, name):
+        return os.path.join(directory, f"{name}_timings.jsonl")
@@ -0,0 +1,152 @@
+"""
+Taxon lookups cached for the process and on disk across imports.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# taxa found keep for a week, names with no taxon for a day as they may be added
+TTL = 7 * 24 * 3600
+NEGATIVE_TTL = 24 * 3600
+MAX_ENTRIES = 10000
+# last use times are written to the database in batches of this many
+USE_BATCH_SIZE = 100
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class TaxonCache:
+    """Taxon lookups keyed by (taxon workspace, scientific name, tax_id),
+    held in memory and in a SQLite database that later imports share.
+
+    A value is the tuple retrieve_taxon returns. Lookups that found no taxon
+    are cached as well, with the shorter NEGATIVE_TTL. Past max_entries the
+    least recently used entries are evicted. Uses are only recorded in the
+    database in batches and before evicting, so a hit in memory doesn't
+    write to it. hits and misses count the lookups answered and not
+    answered by the cache. The database is only a cache, so errors using it
+    are logged and otherwise ignored."""
+
+    def __init__(self, path, ttl=TTL, negative_ttl=NEGATIVE_TTL, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # key -> (value, found, stored)
+        self._memory = OrderedDict()
+        # key -> time of its last use, not yet written to the database
+        self._used = {}
+        self._lock = threading.Lock()
+        self._db = None
+        try:
+            self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS taxon (workspace TEXT, name TEXT, tax_id TEXT, "
+                    "taxonomy TEXT, taxon_ref TEXT, domain TEXT, genetic_code INTEGER, "
+                    "found INTEGER, stored REAL, used REAL, "
+                    "PRIMARY KEY (workspace, name, tax_id))")
+                self._db.execute("CREATE INDEX IF NOT EXISTS taxon_used ON taxon (used)")
+        except sqlite3.Error as e:
+            logging.warning(f"Unable to open the taxon cache {path}, using memory only: {e}")
+            self._db = None
+
+    @classmethod
+    def shared(cls, path, **kwargs):
+        """The cache of the process for path"""
+        path = os.path.abspath(path)
+        with _caches_lock:
+            if path not in _caches:
+                _caches[path] = cls(path, **kwargs)
+            return _caches[path]
+
+    def _expired(self, found, stored, now):
+        return now - stored > (self.ttl if found else self.negative_ttl)
+
+    def get(self, key):
+        """The cached value for key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry[1], entry[2], now):
+                del self._memory[key]
+                entry = None
+            if entry is None:
+                entry = self._read(key, now)
+                if entry is not None:
+                    self._remember(key, entry)
+            else:
+                self._memory.move_to_end(key)
+                self._use(key, now)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, found=True):
+        now = time.time()
+        with self._lock:
+            self._remember(key, (tuple(value), found, now))
+            if self._db is None:
+                return
+            self._used.pop(key, None)
+            try:
+                with self._db:
+                    # evict by up to date use times
+                    self._write_uses()
+                    self._db.execute("INSERT OR REPLACE INTO taxon VALUES "
+                                     "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                     key + tuple(value) + (int(found), now, now))
+                    self._db.execute(
+                        "DELETE FROM taxon WHERE rowid IN (SELECT rowid FROM taxon "
+                        "ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            except sqlite3.Error as e:
+                logging.warning(f"Unable to update the taxon cache {self.path}: {e}")
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read(self, key, now):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT taxonomy, taxon_ref, domain, genetic_code, found, stored FROM taxon "
+                "WHERE workspace = ? AND name = ? AND tax_id = ?", key).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Unable to read the taxon cache {self.path}: {e}")
+            return None
+        if row is None or self._expired(row[4], row[5], now):
+            return None
+        self._use(key, now)
+        return row[:4], bool(row[4]), row[5]
+
+    def _use(self, key, now):
+        if self._db is None:
+            return
+        self._used[key] = now
+        if len(self._used) >= USE_BATCH_SIZE:
+            try:
+                with self._db:
+                    self._write_uses()
+            except sqlite3.Error as e:
+                logging.warning(f"Unable to update the taxon cache {self.path}: {e}")
+
+    def _write_uses(self):
+        """Write the pending use times, within the caller's transaction"""
+        used, self._used = self._used, {}
+        self._db.executemany("UPDATE taxon SET used = ? WHERE workspace = ? AND name = ? "
+                             "AND tax_id = ?", [(now,) + key for key, now in used.items()])
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._memory)}
@@ -0,0 +1,176 @@
+"""
+A local snapshot of a taxon workspace that taxa are resolved against
+through mmap before the search service is asked.
+"""
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+
+# file layout: header, workspace name, source, a hash table of key slots,
+# key offsets, the record of each key, record offsets, then the utf-8 keys
+# followed by the tab separated records. The header holds the counts, the
+# time the snapshot was built and the lengths of the two names
+MAGIC = b"KBTAXSN2"
+HEADER = struct.Struct("<8sIIIIdI")
+SLOT = struct.Struct("<I")
+OFFSET = struct.Struct("<Q")
+
+# keys are prefixed with what they are, and a scientific name is preferred
+# over an alias as the search service lookups are
+SCIENTIFIC_NAME = b"s:"
+ALIAS = b"a:"
+TAX_ID = b"t:"
+
+# snapshots older than this are not used, as taxa are added and revised
+MAX_AGE_DAYS = 90
+
+
+def _slot(key, slot_count):
+    return zlib.crc32(key) & (slot_count - 1)
+
+
+def write_taxonomy_snapshot(taxa, workspace, snapshot_file, source='', built=None):
+    """Write a snapshot of taxa, which are (object_name, data) pairs of the
+    objects in workspace. The first taxon given for a name or tax_id is the
+    one it resolves to. source describes where the taxa came from, and
+    built is when they were fetched, by default now."""
+    keys, records = {}, []
+    for object_name, data in taxa:
+        record = len(records)
+        records.append("\t".join((object_name, data['scientific_lineage'], data['domain'],
+                                  str(data.get('genetic_code', 11)))).encode('utf8'))
+        names = [SCIENTIFIC_NAME + data['scientific_name'].encode('utf8')]
+        names += [ALIAS + alias.encode('utf8') for alias in data.get('aliases') or []]
+        # taxa are fetched by tax_id as the <tax_id>_taxon object
+        if object_name.endswith('_taxon'):
+            names.append(TAX_ID + object_name[:-len('_taxon')].encode('utf8'))
+        for key in names:
+            keys.setdefault(key, record)
+
+    # at most half full, so probes stay short
+    slot_count = 1
+    while slot_count < 2 * len(keys):
+        slot_count *= 2
+    slots = [0] * slot_count
+    for i, key in enumerate(keys):
+        slot = _slot(key, slot_count)
+        while slots[slot]:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = i + 1
+
+    blob = bytearray()
+    key_offsets, record_offsets = [], []
+    for key in keys:
+        key_offsets.append(len(blob))
+        blob += key
+    key_offsets.append(len(blob))
+    for record in records:
+        record_offsets.append(len(blob))
+        blob += record
+    record_offsets.append(len(blob))
+
+    workspace = workspace.encode('utf8')
+    source = source.encode('utf8')
+    built = time.time() if built is None else built
+    with open(snapshot_file, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, len(workspace), len(records), len(keys), slot_count,
+                              built, len(source)))
+        out.write(workspace)
+        out.write(source)
+        out.write(struct.pack(f"<{slot_count}I", *slots))
+        out.write(struct.pack(f"<{len(key_offsets)}Q", *key_offsets))
+        out.write(struct.pack(f"<{len(keys)}I", *keys.values()))
+        out.write(struct.pack(f"<{len(record_offsets)}Q", *record_offsets))
+        out.write(blob)
+
+
+class TaxonomySnapshot:
+    """Read only lookups of taxa by scientific name, alias or tax_id in a
+    file made by write_taxonomy_snapshot. A lookup hashes the key to its
+    slot, so only the few bytes it probes are read from the mapped file.
+
+    Found taxa are (object_name, scientific_lineage, domain, genetic_code)
+    tuples of objects in the snapshot's workspace. built and source say
+    when and from what the snapshot was made."""
+
+    def __init__(self, snapshot_file):
+        self.path = snapshot_file
+        with open(snapshot_file, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{snapshot_file} is not a taxonomy snapshot of this version")
+        (_, workspace_length, self._record_count, self._key_count, self._slot_count,
+         self.built, source_length) = HEADER.unpack_from(self._mmap)
+        source = HEADER.size + workspace_length
+        self.workspace = self._mmap[HEADER.size:source].decode('utf8')
+        self.source = self._mmap[source:source + source_length].decode('utf8')
+        self._slots = source + source_length
+        self._key_offsets = self._slots + SLOT.size * self._slot_count
+        self._key_records = self._key_offsets + OFFSET.size * (self._key_count + 1)
+        self._record_offsets = self._key_records + SLOT.size * self._key_count
+        self._blob = self._record_offsets + OFFSET.size * (self._record_count + 1)
+
+    def __len__(self):
+        return self._record_count
+
+    @property
+    def age_days(self):
+        return (time.time() - self.built) / 86400
+
+    def _span(self, table, i):
+        return (OFFSET.unpack_from(self._mmap, table + OFFSET.size * i)[0],
+                OFFSET.unpack_from(self._mmap, table + OFFSET.size * (i + 1))[0])
+
+    def _find(self, key):
+        blob = self._blob
+        slot = _slot(key, self._slot_count)
+        while True:
+            i = SLOT.unpack_from(self._mmap, self._slots + SLOT.size * slot)[0]
+            if not i:
+                return None
+            start, end = self._span(self._key_offsets, i - 1)
+            if self._mmap[blob + start:blob + end] == key:
+                record = SLOT.unpack_from(self._mmap, self._key_records + SLOT.size * (i - 1))[0]
+                start, end = self._span(self._record_offsets, record)
+                object_name, lineage, domain, genetic_code = \
+                    self._mmap[blob + start:blob + end].decode('utf8').split("\t")
+                return object_name, lineage, domain, int(genetic_code)
+            slot = (slot + 1) & (self._slot_count - 1)
+
+    def find_name(self, name):
+        """The taxon with name as its scientific name, or else as an alias"""
+        name = name.encode('utf8')
+        return self._find(SCIENTIFIC_NAME + name) or self._find(ALIAS + name)
+
+    def find_tax_id(self, tax_id):
+        return self._find(TAX_ID + str(tax_id).encode('utf8'))
+
+
+# snapshots are read only, so every GenomeInterface in the process shares them
+_open_snapshots = {}
+
+
+def open_taxonomy_snapshot(snapshot_file, max_age_days=MAX_AGE_DAYS):
+    """The snapshot at snapshot_file, or None if there isn't a usable one.
+    Snapshots built more than max_age_days ago are stale and not used."""
+    if not snapshot_file or not os.path.exists(snapshot_file):
+        return None
+    if snapshot_file not in _open_snapshots:
+        logging.info(f"Opening taxonomy snapshot {snapshot_file}")
+        try:
+            _open_snapshots[snapshot_file] = TaxonomySnapshot(snapshot_file)
+        except (OSError, ValueError, struct.error) as e:
+            logging.warning(f"Unable to open the taxonomy snapshot, not using it: {e}")
+            return None
+    snapshot = _open_snapshots[snapshot_file]
+    if snapshot.age_days > max_age_days:
+        built = time.strftime('%Y-%m-%d', time.gmtime(snapshot.built))
+        logging.warning(f"Not using the taxonomy snapshot {snapshot_file} of "
+                        f"{snapshot.source or 'an unknown source'} built {built}, as it is over "
+                        f"{max_age_days} days old. Rebuild it with data/taxa_to_snapshot.py")
+        return None
+    return snapshot
@@ -0,0 +1,210 @@
+"""
+Table driven translation of coding sequences for the NCBI genetic codes.
+"""
+import re
+from functools import lru_cache
+from itertools import product, repeat
+
+from Bio.Data.CodonTable import TranslationError
+
+# Amino acids and start/stop markers of the NCBI genetic codes in the
+# TTT, TTC, TTA, TTG, TCT ... GGG codon order used by the NCBI gc.prt file.
+# Start codons follow the Biopython tables this module replaced
+BASE_ORDER = "TCAG"
+GENETIC_CODES = {
+    1: ("FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+        "---M------**--*----M---------------M----------------------------"),
+    2: ("FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNKKSS**VVVVAAAADDEEGGGG",
+        "----------**--------------------MMMM----------**---M------------"),
+    3: ("FFLLSSSSYY**CCWWTTTTPPPPHHQQRRRRIIMMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+        "----------**----------------------MM----------------------------"),
+    4: ("FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+        "--MM------**-------M------------MMMM---------------M------------"),
+    5: ("FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNKKSSSSVVVVAAAADDEEGGGG",
+        "---M------**--------------------MMMM---------------M------------"),
+    6: ("FFLLSSSSYYQQCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+        "--------------*--------------------M----------------------------"),
+    9: ("FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNNKSSSSVVVVAAAADDEEGGGG",
+        "----------**-----------------------M---------------M------------"),
+    10: ("FFLLSSSSYY**CCCWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "----------**-----------------------M----------------------------"),
+    11: ("FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "---M------**--*----M------------MMMM---------------M------------"),
+    12: ("FFLLSSSSYY**CC*WLLLSPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "----------**--*----M---------------M----------------------------"),
+    13: ("FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNKKSSGGVVVVAAAADDEEGGGG",
+         "---M------**----------------------MM---------------M------------"),
+    14: ("FFLLSSSSYYY*CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNNKSSSSVVVVAAAADDEEGGGG",
+         "-----------*-----------------------M----------------------------"),
+    15: ("FFLLSSSSYY*QCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "----------*---*--------------------M----------------------------"),
+    16: ("FFLLSSSSYY*LCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "----------*---*--------------------M----------------------------"),
+    21: ("FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNNKSSSSVVVVAAAADDEEGGGG",
+         "----------**-----------------------M---------------M------------"),
+    22: ("FFLLSS*SYY*LCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "------*---*---*--------------------M----------------------------"),
+    23: ("FF*LSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "--*-------**--*-----------------M--M---------------M------------"),
+    24: ("FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSSKVVVVAAAADDEEGGGG",
+         "---M------**-------M---------------M---------------M------------"),
+    25: ("FFLLSSSSYY**CCGWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "---M------**-----------------------M---------------M------------"),
+    26: ("FFLLSSSSYY**CC*WLLLAPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "---M------**--*----M---------------M----------------------------"),
+    # in 27, 28 and 31 some stop codons are read through when in frame
+    27: ("FFLLSSSSYYQQCCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "--------------*--------------------M----------------------------"),
+    28: ("FFLLSSSSYYQQCCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "----------**--*--------------------M----------------------------"),
+    29: ("FFLLSSSSYYYYCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "--------------*--------------------M----------------------------"),
+    30: ("FFLLSSSSYYEECC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "--------------*--------------------M----------------------------"),
+    31: ("FFLLSSSSYYEECCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+         "----------**-----------------------M----------------------------"),
+}
+
+# IUPAC nucleotide and protein ambiguity codes, matching the generic tables
+# Bio.Seq.translate uses so ambiguous codons resolve exactly as they did
+AMBIGUOUS_BASES = {
+    "A": "A", "C": "C", "G": "G", "T": "T", "U": "T",
+    "M": "AC", "R": "AG", "W": "AT", "S": "CG", "Y": "CT", "K": "GT",
+    "V": "ACG", "H": "ACT", "D": "AGT", "B": "CGT", "X": "ACGT", "N": "ACGT",
+}
+AMBIGUOUS_AMINO_ACIDS = {"B": "ND", "J": "IL", "Z": "QE", "X": "ACDEFGHIKLMNPQRSTVWY"}
+# X is resolved above but Bio treats an unresolvable codon holding it as invalid
+VALID_BASES = set(AMBIGUOUS_BASES) - {"X"}
+STOP = "*"
+POSSIBLE_STOP = "X"
+codon_re = re.compile("...", re.DOTALL)
+
+
+def _resolve(amino_acids):
+    """The least ambiguous protein letter covering all the amino acids"""
+    if len(amino_acids) == 1:
+        return next(iter(amino_acids))
+    return min((len(v), k) for k, v in AMBIGUOUS_AMINO_ACIDS.items()
+               if amino_acids.issubset(v))[1]
+
+
+class Translator:
+    """Translates coding sequences with a precompiled codon lookup table
+    for one genetic code.
+
+    Every codon over the IUPAC nucleotide alphabet is resolved once, so
+    translating a CDS is a dict lookup per codon.
+    Errors carry the same messages as Bio.Seq.translate(cds=True)."""
+
+    def __init__(self, genetic_code=11):
+        if genetic_code not in GENETIC_CODES:
+            raise ValueError(f"{genetic_code} is not a valid NCBI genetic code")
+        self.genetic_code = genetic_code
+        amino_acids, starts = GENETIC_CODES[genetic_code]
+        forward, stops, start_codons = {}, set(), set()
+        for codon, aa, start in zip(product(BASE_ORDER, repeat=3), amino_acids, starts):
+            codon = "".join(codon)
+            if aa != STOP:
+                forward[codon] = aa
+            if start == STOP:
+                stops.add(codon)
+            elif start == "M":
+                start_codons.add(codon)
+
+        self.codons = {}
+        self.start_codons = set()
+        self.stop_codons = set()
+        for codon in map("".join, product(AMBIGUOUS_BASES, repeat=3)):
+            expanded = ["".join(c) for c in product(*(AMBIGUOUS_BASES[b] for b in codon))]
+            if all(c in start_codons for c in expanded):
+                self.start_codons.add(codon)
+            if all(c in stops for c in expanded):
+                self.stop_codons.add(codon)
+            if all(c in forward for c in expanded):
+                self.codons[codon] = _resolve({forward[c] for c in expanded})
+            elif codon in self.stop_codons:
+                self.codons[codon] = STOP
+            elif VALID_BASES.issuperset(codon):
+                self.codons[codon] = POSSIBLE_STOP
+        # the same table keyed by base triples, so a sequence is translated
+        # without cutting it into codon strings first
+        self._codon_triples = {tuple(codon): aa for codon, aa in self.codons.items()}
+
+    def translate_cds(self, sequence):
+        """Translate a complete CDS, returning the protein without its stop.
+        Raises TranslationError for a bad start or stop codon, a length that
+        is not a multiple of three or an in frame stop"""
+        sequence = str(sequence).upper()
+        self._check_ends(sequence)
+        protein = "M" + self._translate(sequence, 3, len(sequence) - 3)
+        if STOP in protein or "?" in protein:
+            self._raise_first_error(sequence[3:-3])
+        return protein
+
+    def translate_cdss(self, sequences):
+        """Translate a batch of coding sequences, returning a list of
+        (protein, error message) pairs where exactly one is not None.
+
+        The start, length and stop of each CDS are checked on its own, then
+        the inner codons of every CDS that passed are run through the table
+        in one pass and the protein is cut back into per CDS pieces"""
+        results = []
+        inner, lengths = [], []
+        for seq in sequences:
+            seq = str(seq).upper()
+            try:
+                self._check_ends(seq)
+            except TranslationError as e:
+                results.append((None, str(e)))
+                continue
+            results.append(None)
+            inner.append(seq[3:-3])
+            lengths.append(len(inner[-1]) // 3)
+
+        joined = "".join(inner)
+        proteins = self._translate(joined, 0, len(joined))
+        start = 0
+        pieces = iter(zip(inner, lengths))
+        for i, result in enumerate(results):
+            if result is not None:
+                continue
+            seq, length = next(pieces)
+            protein = proteins[start:start + length]
+            start += length
+            if STOP in protein or "?" in protein:
+                try:
+                    self._raise_first_error(seq)
+                except TranslationError as e:
+                    results[i] = (None, str(e))
+                    continue
+            results[i] = ("M" + protein, None)
+        return results
+
+    def _check_ends(self, sequence):
+        length = len(sequence)
+        if sequence[:3] not in self.start_codons:
+            raise TranslationError(f"First codon '{sequence[:3]}' is not a start codon")
+        if length % 3:
+            raise TranslationError(f"Sequence length {length} is not a multiple of three")
+        if sequence[-3:] not in self.stop_codons:
+            raise TranslationError(f"Final codon '{sequence[-3:]}' is not a stop codon")
+
+    def _translate(self, sequence, start, end):
+        """Look up every codon of sequence[start:end], with ? for a codon
+        outside the table"""
+        bases = iter(sequence[start:end])
+        return "".join(map(self._codon_triples.get, zip(bases, bases, bases), repeat("?")))
+
+    def _raise_first_error(self, sequence):
+        for codon in codon_re.findall(sequence):
+            aa = self.codons.get(codon)
+            if aa is None:
+                raise TranslationError(f"Codon '{codon}' is invalid")
+            if aa == STOP:
+                raise TranslationError("Extra in frame stop codon found.")
+
+
+@lru_cache(maxsize=None)
+def get_translator(genetic_code=11):
+    """A shared Translator for a genetic code, compiled on first use"""
+    return Translator(genetic_code)
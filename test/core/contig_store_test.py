@@ -0,0 +1,25 @@
+import shutil
+import tempfile
+import unittest
+
+from GenomeFileUtil.core.ContigStore import ContigStore
+
+
+class ContigStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch)
+
+    def test_contig_store(self):
+        seq = "ACGTNNNNNacgtRYACGTTTGCA"
+        with ContigStore(self.scratch) as store:
+            store.add("contig_1", seq)
+            store.add("contig_2", "GGGCCC")
+            self.assertEqual(store.length("contig_1"), len(seq))
+            self.assertEqual(store.get("contig_1", 0, len(seq)), seq.upper())
+            self.assertEqual(store.get("contig_1", 3, 11), "TNNNNNAC")
+            self.assertEqual(store.get("contig_1", 3, 11, '-'), "GTNNNNNA")
+            self.assertEqual(store.get("contig_1", 12, 16, '-'), "TRYA")
+            self.assertEqual(store.get("contig_2", 1, 10), "GGCCC")
+            self.assertEqual(store.md5("contig_2"), "ff3e4f42e8426570fa1e1db97ceac4e3")
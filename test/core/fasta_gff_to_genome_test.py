@@ -0,0 +1,149 @@
+import json
+import os
+import time
+import unittest
+from configparser import ConfigParser
+
+from installed_clients.DataFileUtilClient import DataFileUtil
+from GenomeFileUtil.GenomeFileUtilImpl import GenomeFileUtil, SDKConfig
+from GenomeFileUtil.GenomeFileUtilServer import MethodContext
+from GenomeFileUtil.core.FastaGFFToGenome import FastaGFFToGenome
+from installed_clients.WorkspaceClient import Workspace as workspaceService
+
+
+class GenomeFileUtilTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        token = os.environ.get('KB_AUTH_TOKEN', None)
+        # WARNING: don't call any logging methods on the context object,
+        # it'll result in a NoneType error
+        cls.ctx = MethodContext(None)
+        cls.ctx.update({'token': token,
+                        'provenance': [
+                            {'service': 'GenomeFileUtil',
+                             'method': 'please_never_use_it_in_production',
+                             'method_params': []
+                             }],
+                        'authenticated': 1})
+        config_file = os.environ.get('KB_DEPLOYMENT_CONFIG', None)
+        cls.cfg = {}
+        config = ConfigParser()
+        config.read(config_file)
+        for nameval in config.items('GenomeFileUtil'):
+            cls.cfg[nameval[0]] = nameval[1]
+        cls.wsURL = cls.cfg['workspace-url']
+        cls.wsClient = workspaceService(cls.wsURL, token=token)
+        cls.serviceImpl = GenomeFileUtil(cls.cfg)
+        cls.dfu = DataFileUtil(os.environ['SDK_CALLBACK_URL'], token=token)
+        suffix = int(time.time() * 1000)
+        cls.wsName = "test_GenomeFileUtil_" + str(suffix)
+        cls.wsClient.create_workspace({'workspace': cls.wsName})
+
+    @classmethod
+    def tearDownClass(cls):
+        if hasattr(cls, 'wsName'):
+            cls.wsClient.delete_workspace({'workspace': cls.wsName})
+            print('Test workspace was deleted')
+
+    def import_gff(self, fasta_path, gff_path, genome_name, **params):
+        params.update({'workspace_name': self.wsName,
+                       'genome_name': genome_name,
+                       'fasta_file': {'path': fasta_path},
+                       'gff_file': {'path': gff_path}})
+        result = self.serviceImpl.fasta_gff_to_genome(self.ctx, params)[0]
+        return self.dfu.get_objects(
+            {'object_refs': [result['genome_ref']]})['data'][0]['data']
+
+    def test_parallel_workers(self):
+        # extracting features in worker processes must not change the genome
+        fasta_path = "data/fasta_gff/RefSeq/Bacterial_Data/NC_021490.fasta.gz"
+        gff_path = "data/fasta_gff/RefSeq/Bacterial_Data/NC_021490.gff.gz"
+        serial = self.import_gff(fasta_path, gff_path, "serial_genome")
+        parallel = self.import_gff(fasta_path, gff_path, "parallel_genome",
+                                   parallel_workers=2)
+        # these differ between any two imports of the same files
+        for key in ('id', 'assembly_ref', 'gff_handle_ref'):
+            serial.pop(key)
+            parallel.pop(key)
+        for event in serial.get('ontology_events', []) + parallel.get('ontology_events', []):
+            event.pop('timestamp')
+        self.assertEqual(serial, parallel)
+
+    def test_gtf_without_identifiers(self):
+        # every line of this GTF has an empty gene_id and transcript_id
+        with open("data/rhodobacter_contigs.json") as f:
+            contigs = json.load(f)['contigs']
+        fasta_path = os.path.join(self.cfg['scratch'], "rhodobacter_contigs.fa")
+        with open(fasta_path, 'w') as f:
+            for contig in contigs:
+                f.write(f">{contig['id']}\n{contig['sequence']}\n")
+        genome = self.import_gff(fasta_path, "data/rhodobacter.gtf", "rhodobacter_gtf",
+                                 generate_missing_genes=1)
+        self.assertEqual(len(genome['cdss']), 4116)
+        self.assertEqual(len(genome['mrnas']), 0)
+        self.assertEqual(len(genome['non_coding_features']), 42)
+        # each CDS is its own feature with a gene spoofed for it
+        self.assertEqual(len(genome['features']), 4116)
+        self.assertEqual(len({cds['id'] for cds in genome['cdss']}), 4116)
+        for cds in genome['cdss']:
+            self.assertEqual(cds['parent_gene'], cds['id'] + "_gene")
+
+    def test_gencode_gtf(self):
+        genome = self.import_gff("data/fasta_gff/GENCODE/gencode_style.fa",
+                                 "data/fasta_gff/GENCODE/gencode_style.gtf", "gencode_gtf")
+        gene_id = "ENSG00000000001.1"
+        transcript_ids = ["ENST00000000011.1", "ENST00000000012.1"]
+        self.assertEqual([g['id'] for g in genome['features']], [gene_id])
+        self.assertEqual(genome['features'][0]['mrnas'], transcript_ids)
+        self.assertEqual([(m['id'], m['parent_gene'], m['cds']) for m in genome['mrnas']],
+                         [(t, gene_id, f"{t}.CDS") for t in transcript_ids])
+        self.assertEqual([(c['id'], c['parent_gene'], c['parent_mrna']) for c in genome['cdss']],
+                         [(f"{t}.CDS", gene_id, t) for t in transcript_ids])
+        self.assertEqual(genome['mrnas'][0]['location'],
+                         [['chr1', 1, '+', 102], ['chr1', 151, '+', 150]])
+        self.assertEqual(genome['cdss'][0]['location'],
+                         [['chr1', 31, '+', 72], ['chr1', 151, '+', 117]])
+        # the lncRNA gene and its transcript
+        self.assertEqual([(f['id'], f['type'], f.get('parent_gene'))
+                          for f in genome['non_coding_features']],
+                         [("ENSG00000000002.1", 'gene', None),
+                          ("ENST00000000021.1", 'transcript', "ENSG00000000002.1")])
+
+    def test_parents_first(self):
+        features = [{'ID': 'cds1', 'Parent': 'mrna1'}, {'ID': 'cds1', 'Parent': 'mrna1', 'part': 2},
+                    {'ID': 'mrna1', 'Parent': 'gene1'}, {'ID': 'gene2'}, {'ID': 'gene1'},
+                    {'ID': 'orphan', 'Parent': 'missing'}]
+        ordered = FastaGFFToGenome._parents_first(features)
+        self.assertEqual([f['ID'] for f in ordered],
+                         ['gene1', 'mrna1', 'cds1', 'cds1', 'gene2', 'orphan'])
+        self.assertEqual(ordered[3].get('part'), 2)
+        in_order = [{'ID': 'gene1'}, {'ID': 'mrna1', 'Parent': 'gene1'}, {'ID': 'gene2'}]
+        self.assertEqual(FastaGFFToGenome._parents_first(in_order), in_order)
+
+    def test_gtf_identifiers(self):
+        gtf_file = os.path.join(self.cfg['scratch'], "identifiers_test.gtf")
+        with open(gtf_file, 'w') as f:
+            # a GENCODE style gene, then one with only exons and CDSs
+            f.write('chr1\tEnsembl\tgene\t1\t90\t.\t+\t.\tgene_id "g1"; gene_name "A";\n'
+                    'chr1\tEnsembl\ttranscript\t1\t90\t.\t+\t.\tgene_id "g1"; transcript_id "t1";\n'
+                    'chr1\tEnsembl\texon\t1\t90\t.\t+\t.\tgene_id "g1"; transcript_id "t1";\n'
+                    'chr1\tEnsembl\tCDS\t4\t60\t.\t+\t0\tgene_id "g1"; transcript_id "t1";\n'
+                    'chr1\tEnsembl\tstart_codon\t4\t6\t.\t+\t0\tgene_id "g1"; transcript_id "t1";\n'
+                    'chr1\tEnsembl\texon\t100\t150\t.\t-\t.\tgene_id "g2"; transcript_id "g2";\n'
+                    'chr1\tEnsembl\tCDS\t100\t120\t.\t-\t0\tgene_id "g2"; transcript_id "g2";\n'
+                    'chr1\tEnsembl\tCDS\t130\t150\t.\t-\t0\tgene_id "g2"; transcript_id "g2";\n'
+                    'chr1\tKBase\tCDS\t200\t290\t.\t+\t0\tgene_id ""; transcript_id ""\n')
+        importer = FastaGFFToGenome(SDKConfig(self.cfg))
+        features = importer._retrieve_gff_file(gtf_file)['chr1']
+        self.assertEqual([(f.type, f.ID, f.Parent, f.start, f.end) for f in features], [
+            ('gene', 'g1', None, 1, 90),
+            ('mRNA', 't1', 'g1', 1, 90),
+            ('exon', 't1.exon', 't1', 1, 90),
+            ('CDS', 't1.CDS', 't1', 4, 60),
+            ('gene', 'g2', None, 100, 150),
+            ('mRNA', 'g2.mRNA', 'g2', 100, 150),
+            ('exon', 'g2.exon', 'g2.mRNA', 100, 150),
+            ('CDS', 'g2.CDS', 'g2.mRNA', 100, 120),
+            ('CDS', 'g2.CDS', 'g2.mRNA', 130, 150),
+            ('CDS', 'CDS_1', None, 200, 290),
+        ])
@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from GenomeFileUtil.core.FastaIndex import FastaIndex, UnindexableFasta
+
+
+class FastaIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch)
+
+    def test_fasta_index(self):
+        fasta_file = os.path.join(self.scratch, "index_test.fa")
+        with open(fasta_file, 'w') as f:
+            f.write(">contig_1 some description\nACGTA\nCGTAC\nGT\n>contig_2\r\nacgt\r\nac\r\n\n")
+        with FastaIndex(fasta_file) as index:
+            self.assertEqual(list(index.keys()), ['contig_1', 'contig_2'])
+            self.assertEqual(index.length('contig_1'), 12)
+            self.assertEqual(index.get('contig_1', 0, 12), "ACGTACGTACGT")
+            self.assertEqual(index.get('contig_1', 3, 11, '-'), "CGTACGTA")
+            self.assertEqual(index.get('contig_2', 2, 6), "GTAC")
+        with open(fasta_file + '.fai') as f:
+            self.assertEqual(f.read(), "contig_1\t12\t27\t5\t6\n"
+                                       "contig_2\t6\t53\t4\t6\n")
+        # an index newer than a rewritten file is rebuilt when it no longer fits it
+        index_time = os.path.getmtime(fasta_file + '.fai')
+        with open(fasta_file, 'w') as f:
+            f.write(">contig_1\nACGTA\nCGTAC\nGT\n>contig_3\nACGT\nAC\n")
+        os.utime(fasta_file, (index_time - 10, index_time - 10))
+        with FastaIndex(fasta_file) as index:
+            self.assertEqual(list(index.keys()), ['contig_1', 'contig_3'])
+            self.assertEqual(index.get('contig_3', 0, 6), "ACGTAC")
+        with open(fasta_file, 'w') as f:
+            f.write(">contig_1\nAC\nACGT\n")
+        os.remove(fasta_file + '.fai')
+        with self.assertRaises(UnindexableFasta):
+            FastaIndex(fasta_file)
+        for bad_fasta in (">\nACGT\n", "ACGT\n>contig_1\nACGT\n",
+                          ">contig_1\nACGT ACGT\nACG\n", ">contig_1\nACGT\t\nACG\n"):
+            with open(fasta_file, 'w') as f:
+                f.write(bad_fasta)
+            with self.assertRaises(UnindexableFasta):
+                FastaIndex(fasta_file)
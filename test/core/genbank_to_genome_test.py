@@ -0,0 +1,83 @@
+import json
+import os
+import time
+import unittest
+from configparser import ConfigParser
+
+from installed_clients.DataFileUtilClient import DataFileUtil
+from GenomeFileUtil.GenomeFileUtilImpl import GenomeFileUtil
+from GenomeFileUtil.GenomeFileUtilServer import MethodContext
+from installed_clients.WorkspaceClient import Workspace as workspaceService
+
+FEATURE_LISTS = ('features', 'mrnas', 'cdss', 'non_coding_features')
+
+
+class GenomeFileUtilTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        token = os.environ.get('KB_AUTH_TOKEN', None)
+        # WARNING: don't call any logging methods on the context object,
+        # it'll result in a NoneType error
+        cls.ctx = MethodContext(None)
+        cls.ctx.update({'token': token,
+                        'provenance': [
+                            {'service': 'GenomeFileUtil',
+                             'method': 'please_never_use_it_in_production',
+                             'method_params': []
+                             }],
+                        'authenticated': 1})
+        config_file = os.environ.get('KB_DEPLOYMENT_CONFIG', None)
+        cls.cfg = {}
+        config = ConfigParser()
+        config.read(config_file)
+        for nameval in config.items('GenomeFileUtil'):
+            cls.cfg[nameval[0]] = nameval[1]
+        cls.wsURL = cls.cfg['workspace-url']
+        cls.wsClient = workspaceService(cls.wsURL, token=token)
+        cls.serviceImpl = GenomeFileUtil(cls.cfg)
+        cls.dfu = DataFileUtil(os.environ['SDK_CALLBACK_URL'], token=token)
+        suffix = int(time.time() * 1000)
+        cls.wsName = "test_GenomeFileUtil_" + str(suffix)
+        cls.wsClient.create_workspace({'workspace': cls.wsName})
+
+    @classmethod
+    def tearDownClass(cls):
+        if hasattr(cls, 'wsName'):
+            cls.wsClient.delete_workspace({'workspace': cls.wsName})
+            print('Test workspace was deleted')
+
+    def import_genbank(self, gbk_path, genome_name, **params):
+        params.update({'file': {'path': gbk_path},
+                       'workspace_name': self.wsName,
+                       'genome_name': genome_name})
+        result = self.serviceImpl.genbank_to_genome(self.ctx, params)[0]
+        return self.dfu.get_objects(
+            {'object_refs': [result['genome_ref']]})['data'][0]['data']
+
+    def test_trans_spliced_across_records(self):
+        # the trans-spliced gene on CTG1.1 ends on CTG2.1, so CTG1.1 has to
+        # wait for that sequence; features must still come out in file order
+        genome = self.import_genbank("data/trans_spliced_records.gbff",
+                                     "trans_spliced_records")
+        with open("data/trans_spliced_records_features.json") as f:
+            expected = json.load(f)
+        for feature_list in FEATURE_LISTS:
+            self.assertEqual(genome[feature_list], expected[feature_list],
+                             feature_list)
+        self.assertEqual([g['id'] for g in genome['features']],
+                         ['G1', 'TS1', 'G2', 'G3'])
+
+    def test_parallel_workers(self):
+        # parsing features in worker processes must not change the genome
+        gbk_path = "data/Arabidopsis_gbff/Arab_Chloro_Modified.gbff"
+        serial = self.import_genbank(gbk_path, "arab_serial",
+                                     generate_ids_if_needed=1)
+        parallel = self.import_genbank(gbk_path, "arab_parallel",
+                                       generate_ids_if_needed=1, parallel_workers=2)
+        # these differ between any two imports of the same file
+        for key in ('id', 'assembly_ref', 'genbank_handle_ref'):
+            serial.pop(key)
+            parallel.pop(key)
+        for event in serial['ontology_events'] + parallel['ontology_events']:
+            event.pop('timestamp')
+        self.assertEqual(serial, parallel)
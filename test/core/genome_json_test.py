@@ -0,0 +1,22 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from GenomeFileUtil.core.GenomeJSON import SEPARATORS, write_genome_json
+
+
+class GenomeJSONTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch)
+
+    def test_write_genome_json(self):
+        genome = {'id': 'g', 'features': [{'id': 'gene{}'.format(i), 'note': '\u00e9'}
+                                          for i in range(2500)], 'cdss': [], 'dna_size': 10}
+        path = os.path.join(self.scratch, 'write_genome_json.json')
+        write_genome_json(genome, path)
+        with open(path) as f:
+            self.assertEqual(f.read(), json.dumps(genome, separators=SEPARATORS))
@@ -0,0 +1,26 @@
+import copy
+import json
+import unittest
+
+from GenomeFileUtil.core.GenomeSize import GenomeSize
+
+
+class GenomeSizeTest(unittest.TestCase):
+
+    def test_genome_size(self):
+        genome = {'id': 'g', 'features': [{'id': 'gene1', 'dna_sequence': 'ACGT'}, {}],
+                  'cdss': [{'id': 'cds1', 'dna_sequence': 'ACG', 'note': '\u00e9'},
+                           {'dna_sequence': 'A'}]}
+        for separators in ((', ', ': '), (',', ':')):
+            test_genome = copy.deepcopy(genome)
+            sizes = GenomeSize(test_genome, separators)
+            self.assertEqual(sizes.total, len(json.dumps(test_genome, separators=separators)))
+            self.assertEqual(sizes.fields['cdss']['id'],
+                             len(json.dumps({'id': 'cds1'}, separators=separators)) - 2)
+            self.assertGreater(sizes.drop_sequences('cdss'), 0)
+            self.assertNotIn('dna_sequence', sizes.fields['cdss'])
+            self.assertEqual(test_genome['cdss'], [{'id': 'cds1', 'note': '\u00e9'}, {}])
+            for key in ('features', 'cdss'):
+                self.assertEqual(sizes.lists[key],
+                                 len(json.dumps(test_genome[key], separators=separators)))
+            self.assertEqual(sizes.total, len(json.dumps(test_genome, separators=separators)))
@@ -1,70 +1,18 @@
+import hashlib
+import os
+import shutil
+import tempfile
 import unittest
-from configparser import ConfigParser
-from os import environ
-import logging
 
-from GenomeFileUtil.GenomeFileUtilImpl import GenomeFileUtil, SDKConfig
-from GenomeFileUtil.GenomeFileUtilServer import MethodContext
-from GenomeFileUtil.core.GenomeInterface import GenomeInterface
 from GenomeFileUtil.core import GenomeUtils
-from installed_clients.WorkspaceClient import Workspace as workspaceService
-
-
-class GenomeFileUtilTest(unittest.TestCase):
-
-    @classmethod
-    def setUpClass(cls):
-        logging.basicConfig(level=logging.info)
-        token = environ.get('KB_AUTH_TOKEN', None)
-        # WARNING: don't call any logging methods on the context object,
-        # it'll result in a NoneType error
-        cls.ctx = MethodContext(None)
-        cls.ctx.update({'token': token,
-                        'provenance': [
-                            {'service': 'GenomeFileUtil',
-                             'method': 'please_never_use_it_in_production',
-                             'method_params': []
-                             }],
-                        'authenticated': 1})
-        config_file = environ.get('KB_DEPLOYMENT_CONFIG', None)
-        cls.cfg = {}
-        config = ConfigParser()
-        config.read(config_file)
-        for nameval in config.items('GenomeFileUtil'):
-            cls.cfg[nameval[0]] = nameval[1]
-        cls.wsURL = cls.cfg['workspace-url']
-        cls.ws = workspaceService(cls.wsURL, token=token)
-        cls.serviceImpl = GenomeFileUtil(cls.cfg)
-        gi_config = SDKConfig(cls.cfg)
-        cls.genome_interface = GenomeInterface(gi_config)
-
-    @classmethod
-    def tearDownClass(cls):
-        pass
-
-    def test_retreve_taxon(self):
-        self.assertEqual(self.genome_interface.retrieve_taxon("meh", "Arabidopsis thaliana"),
-                         ('cellular organisms; Eukaryota; Viridiplantae; Streptophyta; Streptophytina; Embryophyta; Tracheophyta; Euphyllophyta; Spermatophyta; Magnoliophyta; Mesangiospermae; eudicotyledons; Gunneridae; Pentapetalae; rosids; malvids; Brassicales; Brassicaceae; Camelineae; Arabidopsis',
-                          'meh/3702_taxon', 'Eukaryota', 11))
-        self.assertEqual(self.genome_interface.retrieve_taxon("meh", "Escherichia coli"),
-                         ('cellular organisms; Bacteria; Proteobacteria; Gammaproteobacteria; Enterobacterales; Enterobacteriaceae; Escherichia',
-                          'meh/562_taxon', 'Bacteria', 11))
-        self.assertEqual(self.genome_interface.retrieve_taxon("meh", "rhodobacter"),
-                         ('Unconfirmed Organism: rhodobacter',
-                          'ReferenceTaxons/unknown_taxon', 'Unknown', 11)
-                         )
-        self.assertEqual(self.genome_interface.retrieve_taxon("meh", "foo"),
-                         ('Unconfirmed Organism: foo',
-                          'ReferenceTaxons/unknown_taxon', 'Unknown', 11))
-        self.assertEqual(self.genome_interface.retrieve_taxon("ReferenceTaxons", "foo", 201174),
-                         ('cellular organisms; Bacteria; Terrabacteria group',
-                          'ReferenceTaxons/201174_taxon', 'Bacteria', 11))
-        with self.assertRaisesRegex(ValueError, 'not a valid KBase taxon ID'):
-            self.genome_interface.retrieve_taxon("ReferenceTaxons", "foo", 9999999)
-
-    def test_user(self):
-        self.assertEqual(GenomeInterface.determine_tier('RefSeq user'),
-                         ('RefSeq', ['ExternalDB', 'User']))
+from GenomeFileUtil.core.GenomeUtils import ContigIndex, FragmentBuilder
+
+
+class GenomeUtilsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch)
 
     def test_is_parent(self):
         gene_1 = {"type": "gene", "location": [["A", 100, "+", 400]]}
@@ -119,3 +67,111 @@ class GenomeFileUtilTest(unittest.TestCase):
         self.assertFalse(GenomeUtils.is_parent(mrna_1, cds_3a))
         self.assertFalse(GenomeUtils.is_parent(mrna_1, cds_4))
         self.assertFalse(GenomeUtils.is_parent(mrna_1, cds_5))
+
+    def test_parent_index(self):
+        gene_1 = {"id": "gene_1", "type": "gene", "location": [["A", 100, "+", 400]]}
+        gene_2 = {"id": "gene_2", "type": "gene", "location": [["A", 500, "-", 400]]}
+        gene_3 = {"id": "gene_3", "type": "gene", "location": [["A", 150, "+", 100]]}
+        index = GenomeUtils.ParentIndex()
+        for gene in (gene_1, gene_2, gene_3):
+            index.add(gene)
+        cds_1 = {"type": "CDS", "location": [["A", 160, "+", 50]]}
+        cds_2 = {"type": "CDS", "location": [["A", 450, "-", 50], ["A", 300, "-", 50]]}
+        cds_3 = {"type": "CDS", "location": [["A", 450, "+", 100]]}
+        cds_4 = {"type": "CDS", "location": [["B", 160, "+", 50]]}
+
+        self.assertEqual([g['id'] for g in index.find_parents(cds_1)], ['gene_3', 'gene_1'])
+        self.assertEqual([g['id'] for g in index.find_parents(cds_2)], ['gene_2'])
+        self.assertEqual([g['id'] for g in index.find_parents(cds_3)], [])
+        self.assertEqual([g['id'] for g in index.find_parents(cds_4)], [])
+
+    def test_parent_index_long_gene(self):
+        index = GenomeUtils.ParentIndex()
+        index.add({"id": "long", "type": "gene", "location": [["A", 1, "+", 1000000]]})
+        for i in range(1000):
+            index.add({"id": f"gene_{i}", "type": "gene",
+                       "location": [["A", 1000 * i + 1, "+", 500]]})
+        index.add({"id": "gene_rev", "type": "gene", "location": [["A", 600, "-", 500]]})
+
+        cds_1 = {"type": "CDS", "location": [["A", 500101, "+", 300]]}
+        cds_2 = {"type": "CDS", "location": [["A", 500701, "+", 100]]}
+        cds_3 = {"type": "CDS", "location": [["A", 999901, "+", 200]]}
+        cds_4 = {"type": "CDS", "location": [["A", 550, "-", 300]]}
+        self.assertEqual([g['id'] for g in index.find_parents(cds_1)], ['gene_500', 'long'])
+        self.assertEqual([g['id'] for g in index.find_parents(cds_2)], ['long'])
+        self.assertEqual([g['id'] for g in index.find_parents(cds_3)], [])
+        self.assertEqual([g['id'] for g in index.find_parents(cds_4)], ['gene_rev'])
+
+    def test_skip_empty_lines_reader(self):
+        file_1 = os.path.join(self.scratch, "skip_empty_1.gbff")
+        file_2 = os.path.join(self.scratch, "skip_empty_2.gbff")
+        with open(file_1, 'w') as f:
+            f.write("LOCUS  A\r\n\n   \nORIGIN\n//\n")
+        with open(file_2, 'w') as f:
+            f.write("\nLOCUS  B\n//")
+        with GenomeUtils.SkipEmptyLinesReader([file_1, file_2]) as reader:
+            self.assertEqual(reader.readline(), "LOCUS  A\n")
+            self.assertEqual(list(reader), ["ORIGIN\n", "//\n", "LOCUS  B\n", "//\n"])
+            self.assertEqual(reader.readline(), "")
+
+    def test_ontology_event_index(self):
+        events = [{'id': 'GO', 'method': 'IEA', 'provenance': ['a']},
+                  {'id': 'GO', 'method': 'IEA', 'provenance': ['a']}]
+        index = GenomeUtils.OntologyEventIndex(events)
+        self.assertEqual(index.index({'provenance': ['a'], 'method': 'IEA', 'id': 'GO'}), 0)
+        self.assertEqual(index.index({'id': 'GO', 'method': 'IEA', 'provenance': ['b']}), 2)
+        self.assertEqual(index.index({'id': 'PO', 'method': 'IEA', 'provenance': ['a']}), 3)
+        self.assertEqual(index.index({'id': 'GO', 'method': 'IEA', 'provenance': ['b']}), 2)
+        self.assertEqual(len(index), 4)
+        self.assertIs(index.events, events)
+
+    def test_contig_index(self):
+        contigs = ContigIndex.from_assembly({'contigs': {
+            'c1': {'contig_id': 'c1', 'length': 100, 'is_circ': 1},
+            'c2': {'contig_id': 'c2', 'length': 50}}})
+        self.assertEqual((contigs.ids, contigs.lengths), (['c1', 'c2'], [100, 50]))
+        self.assertTrue(contigs.is_circular('c1'))
+        self.assertFalse(contigs.is_circular('c2'))
+        self.assertEqual(contigs.ordinal('c2'), 1)
+        contig_set = ContigIndex.from_assembly({'contigs': [
+            {'id': 'c1', 'length': 100, 'replicon_geometry': 'circular'}]})
+        self.assertTrue(contig_set.is_circular('c1'))
+        genome_contigs = ContigIndex.from_genome({'contig_ids': ['c1', 'c2'],
+                                                  'contig_lengths': [100, 50]})
+        self.assertEqual(genome_contigs.length('c2'), 50)
+        table = GenomeUtils.LocationTable(genome_contigs, [[['c2', 1, '+', 50]],
+                                                           [['c2', 50, '-', 50]],
+                                                           [['c1', 1, '+', 50]]])
+        self.assertEqual(table.spans_contig(), [True, True, False])
+
+    def test_location_table(self):
+        contigs = ContigIndex.from_assembly({'contigs': {
+            'c1': {'contig_id': 'c1', 'length': 100}, 'c2': {'contig_id': 'c2', 'length': 50}}})
+        table = GenomeUtils.LocationTable(contigs, [
+            [["c1", 1, "+", 100]],
+            [["c1", 60, "-", 10], ["c1", 30, "-", 10]],
+            [["c1", 30, "-", 10], ["c1", 60, "-", 10]],
+            [["c1", 10, "+", 10], ["c1", 60, "-", 10]],
+            [["c1", 100, "-", 50], ["c2", 1, "+", 50]],
+            [["c2", 1, "+", 20], ["c2", 50, "-", 30]]])
+        self.assertEqual(len(table), 6)
+        self.assertEqual(table.part_counts(), [1, 2, 2, 2, 2, 2])
+        self.assertEqual(table.out_of_order(), [False, False, True, False, False, False])
+        self.assertEqual(table.mixed_strands(), [False, False, False, True, True, True])
+        self.assertEqual(table.single_contig(), [True, True, True, True, False, True])
+        self.assertEqual(table.spans_contig(), [True, False, False, False, False, True])
+        self.assertEqual(GenomeUtils.LocationTable(contigs, []).spans_contig(), [])
+
+    def test_fragment_builder(self):
+        cds = {'id': 'cds1', 'location': [['c1', 1, '+', 3]], 'dna_sequence': "ATG",
+               'dna_sequence_length': 3}
+        fragments = FragmentBuilder()
+        fragments.add(cds, ['c1', 10, '+', 3], "AAA")
+        fragments.add(cds, ['c1', 20, '+', 3], "TAA")
+        self.assertEqual(len(fragments), 1)
+        self.assertEqual(cds['dna_sequence'], "ATG")
+        fragments.join({'cds1': cds})
+        self.assertEqual(len(cds['location']), 3)
+        self.assertEqual((cds['dna_sequence'], cds['dna_sequence_length']), ("ATGAAATAA", 9))
+        self.assertEqual(cds['md5'], hashlib.md5(b"ATGAAATAA").hexdigest())
+        self.assertEqual(len(fragments), 0)
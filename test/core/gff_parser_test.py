@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from GenomeFileUtil.core.GFFParser import is_gtf_record, iter_gff
+
+
+class GFFParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch)
+
+    def test_gff_parser(self):
+        gff_file = os.path.join(self.scratch, "parser_test.gff3")
+        with open(gff_file, 'w') as f:
+            f.write("##gff-version 3\n\n"
+                    "chr1\tRefSeq\tgene\t1\t90\t.\t+\t.\tID=gene1;Name=thrL;Note=a%3Bb\n"
+                    "chr1\tRefSeq\tCDS\t1\t90\t.\t+\t0\tID=cds1;Parent=gene1;Dbxref=GeneID:1,GO:2\n"
+                    'chr1\tEnsembl\texon\t1\t90\t.\t+\t.\tgene_id "g1"; transcript_id "t1";\n')
+        gene, cds, exon = iter_gff(gff_file)
+        self.assertEqual((gene['ID'], gene.get('Parent')), ("gene1", None))
+        self.assertNotIn('Parent', gene)
+        self.assertEqual(gene['attributes'], {'id': ["gene1"], 'name': ["thrL"], 'note': ["a;b"]})
+        self.assertEqual((cds['ID'], cds['Parent'], cds['start'], cds['phase']),
+                         ("cds1", "gene1", 1, "0"))
+        self.assertEqual(cds['attributes']['dbxref'], ["GeneID:1,GO:2"])
+        self.assertNotIn('ID', exon)
+        self.assertEqual(exon['attributes'], {'gene_id': ["g1"], 'transcript_id': ["t1"]})
+        self.assertEqual([is_gtf_record(r) for r in (gene, cds, exon)], [False, False, True])
+        exon.raw = 'transcript_id "t1"; gene_id "g1";\n'
+        self.assertTrue(is_gtf_record(exon))
+        exon.raw = '.\n'
+        self.assertIsNone(is_gtf_record(exon))
@@ -0,0 +1,19 @@
+import unittest
+
+from GenomeFileUtil.core import OntologyClassifier
+
+
+class OntologyClassifierTest(unittest.TestCase):
+
+    def test_ontology_classifier(self):
+        terms, db_xrefs = OntologyClassifier.split_db_xrefs(
+            ["GO:0005524", "PF00002", "COG0001", "TIGR00001", "KO:K00001",
+             "PO:0000001", "GeneID:12345", "InterPro:IPR000001"])
+        self.assertEqual(terms, [('GO', "GO:0005524"), ('PFAM', "PF00002"), ('COG', "COG0001"),
+                                 ('TIGRFAM', "TIGR00001"), ('KO', "KO:K00001"),
+                                 ('PO', "PO:0000001")])
+        self.assertEqual(db_xrefs, [("GeneID", "12345"), ("InterPro", "IPR000001")])
+        self.assertEqual(OntologyClassifier.classify_db_xref("GO:0005524"), 'GO')
+        self.assertIsNone(OntologyClassifier.classify_db_xref(""))
+        self.assertEqual(OntologyClassifier.go_terms(["GO:0005524 - ATP binding"]),
+                         [('GO', "GO:0005524")])
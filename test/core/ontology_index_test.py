@@ -0,0 +1,31 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from GenomeFileUtil.core.OntologyIndex import OntologyMappings, write_ontology_index
+
+
+class OntologyIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch)
+
+    def test_ontology_index(self):
+        data_dir = os.path.join(self.scratch, "ontology_index_test")
+        os.makedirs(data_dir, exist_ok=True)
+        with open(os.path.join(data_dir, "po_ontology_mapping.json"), 'w') as f:
+            f.write('{"PO:0000001": "json name"}')
+        write_ontology_index({"PO:0000001": "plant embryo proper", "PO:0000002": "anther wall",
+                              "PO:\u00e9": "\u00e9"},
+                             os.path.join(data_dir, "po_ontology_mapping.idx"))
+        with open(os.path.join(data_dir, "go_ontology_mapping.json"), 'w') as f:
+            f.write('{"GO:0000001": "mitochondrion inheritance"}')
+        mappings = OntologyMappings(data_dir)
+        self.assertEqual(sorted(mappings), ['GO', 'PO'])
+        self.assertEqual(mappings['PO'].get('PO:0000001'), "plant embryo proper")
+        self.assertEqual(mappings['PO'].get('PO:\u00e9'), "\u00e9")
+        self.assertEqual(mappings['PO'].get('PO:0000003', ''), '')
+        self.assertEqual(len(mappings['PO']), 3)
+        self.assertEqual(mappings['GO'].get('GO:0000001'), "mitochondrion inheritance")
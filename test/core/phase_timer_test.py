@@ -0,0 +1,56 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from GenomeFileUtil.core.PhaseTimer import PhaseTimer
+
+
+class PhaseTimerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch)
+
+    def test_phase_timer(self):
+        log_file = PhaseTimer.log_path(self.scratch, "phase_timer_test")
+        timer = PhaseTimer(log_file)
+        with timer.phase('outer') as outer:
+            with timer.phase('inner', features=10):
+                sum(range(10000))
+            outer['features'] = 20
+        self.assertEqual([t['phase'] for t in timer.timings], ['inner', 'outer'])
+        for key in ('wall_time', 'cpu_time', 'peak_rss'):
+            self.assertIn(key, timer.timings[1])
+        self.assertEqual(timer.timings[1]['features'], 20)
+        with open(log_file) as f:
+            self.assertEqual([json.loads(line) for line in f], timer.timings)
+
+    def test_phase_timer_threads(self):
+        timer = PhaseTimer()
+        started = threading.Event()
+
+        def upload():
+            with timer.phase('upload'):
+                started.set()
+                time.sleep(0.5)
+
+        thread = threading.Thread(target=upload)
+        thread.start()
+        started.wait()
+        with timer.phase('parse'):
+            end = time.time() + 0.3
+            while time.time() < end:
+                pass
+            with open(os.path.join(self.scratch, "phase_timer_threads"), 'wb') as f:
+                f.write(b"A" * 2**20)
+        thread.join()
+        parse, upload = timer.timings
+        self.assertGreater(parse['cpu_time'], 0.2)
+        self.assertLess(upload['cpu_time'], 0.1)
+        if 'bytes_written' in parse:
+            self.assertGreaterEqual(parse['bytes_written'], 2**20)
+            self.assertLess(upload['bytes_written'], 2**20)
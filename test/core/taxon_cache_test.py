@@ -0,0 +1,40 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from GenomeFileUtil.core.TaxonCache import TaxonCache
+
+
+class TaxonCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch)
+
+    def test_taxon_cache(self):
+        path = os.path.join(self.scratch, 'test_taxon_cache.sqlite')
+        ecoli = ('Bacteria; Escherichia', 'meh/562_taxon', 'Bacteria', 11)
+        cache = TaxonCache(path, negative_ttl=-1, max_entries=2)
+        self.assertIsNone(cache.get(('meh', 'Escherichia coli', '')))
+        cache.put(('meh', 'Escherichia coli', ''), ecoli)
+        cache.put(('meh', 'foo', ''), ('Unconfirmed Organism: foo',
+                                       'ReferenceTaxons/unknown_taxon', 'Unknown', 11), False)
+        self.assertEqual(cache.get(('meh', 'Escherichia coli', '')), ecoli)
+        # the negative result has expired
+        self.assertIsNone(cache.get(('meh', 'foo', '')))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        # the hit in memory is only written to the database by the next put
+        with sqlite3.connect(path) as db:
+            stored, used = db.execute("SELECT stored, used FROM taxon "
+                                      "WHERE name = 'Escherichia coli'").fetchone()
+        self.assertEqual(used, stored)
+
+        # the least recently used entry is evicted, in memory and on disk
+        cache.put(('meh', '', '562'), ecoli)
+        cache.put(('meh', 'bar', ''), ecoli)
+        reopened = TaxonCache(path)
+        self.assertIsNone(reopened.get(('meh', 'Escherichia coli', '')))
+        self.assertEqual(reopened.get(('meh', '', '562')), ecoli)
+        self.assertIs(TaxonCache.shared(path), TaxonCache.shared(path))
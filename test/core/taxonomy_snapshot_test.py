@@ -0,0 +1,43 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from GenomeFileUtil.core.TaxonomySnapshot import TaxonomySnapshot, open_taxonomy_snapshot, \
+    write_taxonomy_snapshot
+
+
+class TaxonomySnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch)
+
+    def test_taxonomy_snapshot(self):
+        path = os.path.join(self.scratch, 'test_taxonomy_snapshot.idx')
+        ecoli = {'scientific_name': 'Escherichia coli', 'scientific_lineage': 'Bacteria; Escherichia',
+                 'domain': 'Bacteria', 'genetic_code': 11, 'aliases': ['E. coli']}
+        cress = {'scientific_name': 'Arabidopsis thaliana', 'scientific_lineage': 'Eukaryota',
+                 'domain': 'Eukaryota', 'aliases': ['thale cress', 'E. coli']}
+        taxa = [('562_taxon', ecoli), ('3702_taxon', cress)]
+        write_taxonomy_snapshot(taxa, 'ReferenceTaxons', path, 'test dump')
+        snapshot = TaxonomySnapshot(path)
+        self.assertEqual((len(snapshot), snapshot.workspace, snapshot.source),
+                         (2, 'ReferenceTaxons', 'test dump'))
+        self.assertLess(snapshot.age_days, 1)
+        self.assertEqual(snapshot.find_name('Escherichia coli'),
+                         ('562_taxon', 'Bacteria; Escherichia', 'Bacteria', 11))
+        self.assertEqual(snapshot.find_name('thale cress'),
+                         ('3702_taxon', 'Eukaryota', 'Eukaryota', 11))
+        self.assertEqual(snapshot.find_name('E. coli')[0], '562_taxon')
+        self.assertEqual(snapshot.find_tax_id(3702)[0], '3702_taxon')
+        self.assertIsNone(snapshot.find_name('foo'))
+        self.assertIsNone(snapshot.find_tax_id('9999999'))
+
+        self.assertIsNotNone(open_taxonomy_snapshot(path))
+        stale_path = os.path.join(self.scratch, 'test_taxonomy_snapshot_stale.idx')
+        write_taxonomy_snapshot(taxa, 'ReferenceTaxons', stale_path,
+                                built=time.time() - 91 * 86400)
+        self.assertIsNone(open_taxonomy_snapshot(stale_path))
+        self.assertIsNotNone(open_taxonomy_snapshot(stale_path, max_age_days=100))
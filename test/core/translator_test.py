@@ -0,0 +1,28 @@
+import unittest
+
+from GenomeFileUtil.core.Translator import get_translator
+
+
+class TranslatorTest(unittest.TestCase):
+
+    def test_translator(self):
+        translator = get_translator(11)
+        self.assertEqual(translator.translate_cds("GTGAAATTTYTGNNNTAG"), "MKFLX")
+        self.assertEqual(translator.translate_cds("atgGAYTAR"), "MD")
+        self.assertEqual(get_translator(4).translate_cds("ATGTGAAARTAA"), "MWK")
+        self.assertEqual(translator.translate_cdss(["AAATAA", "ATGAAAT", "ATGAAATTT",
+                                                    "ATGTAAAAATGA", "ATG-AAAAATAA"]),
+                         [(None, "First codon 'AAA' is not a start codon"),
+                          (None, "Sequence length 7 is not a multiple of three"),
+                          (None, "Final codon 'TTT' is not a stop codon"),
+                          (None, "Extra in frame stop codon found."),
+                          (None, "Codon '-AA' is invalid")])
+        self.assertEqual(translator.translate_cdss(["ATGAAATAA", "AAATAA", "ATGTAGTAA",
+                                                    "GTGTTTYTGTGA", "ATGTAA"]),
+                         [("MK", None),
+                          (None, "First codon 'AAA' is not a start codon"),
+                          (None, "Extra in frame stop codon found."),
+                          ("MFL", None),
+                          ("M", None)])
+        with self.assertRaises(ValueError):
+            get_translator(7)